@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PoolOccupancyData:
     """Pool occupancy data with proper types."""
 
@@ -23,7 +23,7 @@ class PoolOccupancyData:
         )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TemperatureData:
     pool_id: str | None
     temperature: float | None
@@ -3,8 +3,14 @@ from pathlib import Path
 
 import yaml
 
+try:
+    # libyaml-backed loader; the PyPI wheels of PyYAML ship with it
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader  # type: ignore[assignment]
 
-@dataclass
+
+@dataclass(frozen=True, slots=True, kw_only=True)
 class OccupancyConfig:
     url: str
     retry_interval_seconds: int
@@ -13,21 +19,25 @@ class OccupancyConfig:
     ping_timeout_seconds: float
 
 
-@dataclass
+@dataclass(frozen=True, slots=True, kw_only=True)
 class TemperatureConfig:
     url: str
     poll_interval_seconds: int
     timeout_seconds: int
+    connect_timeout_seconds: float | None = None
+    sock_read_timeout_seconds: float | None = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True, kw_only=True)
 class MetricsConfig:
     port: int
     endpoint: str
     namespace: str
+    # Upper bound on configured pools; every pool adds five labelled series
+    max_pools: int = 500
 
 
-@dataclass
+@dataclass(frozen=True, slots=True, kw_only=True)
 class PoolConfig:
     uid: str
     name: str
@@ -35,13 +45,13 @@ class PoolConfig:
     hardcoded_temperatur: int | None = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True, kw_only=True)
 class LoggingConfig:
     level: str
     format: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True, kw_only=True)
 class AppConfig:
     occupancy: OccupancyConfig
     temperature: TemperatureConfig
@@ -59,7 +69,7 @@ def load_config(config_path: Path | None = None) -> AppConfig:
         raise FileNotFoundError(f"Config file not found: {config_path}")
 
     with open(config_path) as f:
-        config_data = yaml.safe_load(f)
+        config_data = yaml.load(f, Loader=SafeLoader)
 
     return AppConfig(
         occupancy=OccupancyConfig(**config_data["occupancy"]),
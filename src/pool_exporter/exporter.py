@@ -2,21 +2,35 @@ import asyncio
 import logging
 import signal
 import sys
+import threading
 
-from pool_exporter.config import load_config
+import aiohttp
+from prometheus_client import REGISTRY, CollectorRegistry
+
+from pool_exporter.config import AppConfig, load_config
 from pool_exporter.metrics import PoolMetrics
 from pool_exporter.occupancy_collector import OccupancyCollector
 from pool_exporter.temperature_collector import TemperatureCollector
 
 
-async def run_exporter() -> None:
-    """Main entry point for the pool data collector."""
+async def run_exporter(
+    config: AppConfig | None = None,
+    started: threading.Event | None = None,
+    registry: CollectorRegistry = REGISTRY,
+) -> None:
+    """Main entry point for the pool data collector.
+
+    Loads config.yml unless a config is given. If an event is given, it is set
+    once the metrics server is listening. Metrics are registered in and served
+    from the given registry.
+    """
     # Load configuration
-    try:
-        config = load_config()
-    except Exception as e:
-        print(f"Error loading configuration: {e}", file=sys.stderr)
-        sys.exit(1)
+    if config is None:
+        try:
+            config = load_config()
+        except Exception as e:
+            print(f"Error loading configuration: {e}", file=sys.stderr)
+            sys.exit(1)
 
     # Configure logging
     logging.basicConfig(
@@ -27,38 +41,56 @@ async def run_exporter() -> None:
     logger.info("Starting Zürich Pool Data Collector")
 
     # Initialize metrics
-    metrics = PoolMetrics(config)
+    metrics = PoolMetrics(config, registry)
     metrics.start_metrics_server()
+    if started is not None:
+        started.set()
 
-    # Create collectors
-    occupancy_collector = OccupancyCollector(config, metrics)
-    temperature_collector = TemperatureCollector(config, metrics)
+    # One HTTP session for the lifetime of the exporter, so that connections
+    # to the upstream APIs are kept alive and reused between polls
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=8,
+            limit_per_host=4,
+            keepalive_timeout=max(75, config.temperature.poll_interval_seconds),
+        ),
+        timeout=aiohttp.ClientTimeout(total=config.temperature.timeout_seconds),
+    ) as session:
+        # Create collectors
+        occupancy_collector = OccupancyCollector(config, metrics)
+        temperature_collector = TemperatureCollector(config, metrics, session)
 
-    # Set up signal handlers for graceful shutdown
-    loop = asyncio.get_running_loop()
+        # Set up signal handlers for graceful shutdown; registering them on
+        # the loop runs the handler as a regular loop callback
+        loop = asyncio.get_running_loop()
+        main_task = asyncio.current_task()
 
-    def handle_signal(sig: int, frame: object) -> None:
-        logger.info(f"Received signal {sig}, shutting down...")
-        occupancy_collector.stop()
-        temperature_collector.stop()
-        # Give tasks a chance to complete
-        loop.call_later(1, loop.stop)
+        def handle_signal(sig: signal.Signals) -> None:
+            logger.info(f"Received signal {sig.name}, shutting down...")
+            occupancy_collector.stop()
+            temperature_collector.stop()
+            # Give tasks a chance to complete, then cancel whatever is left
+            if main_task is not None:
+                loop.call_later(1, main_task.cancel)
 
-    signal.signal(signal.SIGINT, handle_signal)
-    signal.signal(signal.SIGTERM, handle_signal)
+        # Signal handlers can only be installed from the main thread
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, handle_signal, sig)
 
-    # Run collectors concurrently
-    try:
-        await asyncio.gather(
-            occupancy_collector.run(),
-            temperature_collector.run(),
-        )
-    except asyncio.CancelledError:
-        logger.info("Tasks were cancelled")
-    except Exception as e:
-        logger.exception(f"Unexpected error: {e}")
-    finally:
-        logger.info("Pool Data Collector stopped")
+        # Run collectors concurrently
+        try:
+            await asyncio.gather(
+                occupancy_collector.run(),
+                temperature_collector.run(),
+            )
+        except asyncio.CancelledError:
+            logger.info("Tasks were cancelled")
+        except Exception as e:
+            logger.exception(f"Unexpected error: {e}")
+        finally:
+            metrics.stop_metrics_server()
+            logger.info("Pool Data Collector stopped")
 
 
 def run() -> None:
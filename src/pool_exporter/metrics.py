@@ -1,7 +1,10 @@
 import logging
 from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from wsgiref.simple_server import WSGIServer
 
-from prometheus_client import Gauge, start_http_server
+from prometheus_client import REGISTRY, CollectorRegistry, Gauge, start_http_server
 
 from pool_exporter.api_types import PoolOccupancyData, TemperatureData
 from pool_exporter.config import AppConfig
@@ -9,66 +12,107 @@ from pool_exporter.config import AppConfig
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True, slots=True)
+class _OccupancyGauges:
+    """Labelled occupancy gauges of a single pool."""
+
+    pool_name: str
+    current_fill: Gauge
+    free_space: Gauge
+    max_space: Gauge
+    occupancy_percentage: Gauge
+
+
 class PoolMetrics:
     """Prometheus metrics for pool occupancy and temperature data."""
 
-    def __init__(self, config: AppConfig):
+    def __init__(self, config: AppConfig, registry: CollectorRegistry = REGISTRY):
         self.config = config
+        self.registry = registry
         self.namespace = config.metrics.namespace
-        self.pool_uids: set[str] = {pool.uid for pool in config.pools}
-        self.pool_names: set[str] = {pool.name for pool in config.pools}
-        self.pool_alt_uid_to_uid: Mapping[str, str] = {
-            pool.alt_uid: str(pool.uid) for pool in self.config.pools if pool.alt_uid
-        }
-        self.pool_uid_to_name: Mapping[str, str] = {
-            pool.uid: pool.name for pool in self.config.pools
-        }
+        # Read-only views: these are looked up for every update and never change
+        self.pool_uids: frozenset[str] = frozenset(pool.uid for pool in config.pools)
+        if len(self.pool_uids) > config.metrics.max_pools:
+            raise ValueError(
+                f"{len(self.pool_uids)} pools configured, more than the "
+                f"{config.metrics.max_pools} allowed by metrics.max_pools"
+            )
+        self.pool_names: frozenset[str] = frozenset(pool.name for pool in config.pools)
+        self.pool_alt_uid_to_uid: Mapping[str, str] = MappingProxyType(
+            {pool.alt_uid: str(pool.uid) for pool in self.config.pools if pool.alt_uid}
+        )
+        self.pool_uid_to_name: Mapping[str, str] = MappingProxyType(
+            {pool.uid: pool.name for pool in self.config.pools}
+        )
 
         # Create Prometheus metrics
         self.current_fill = Gauge(
             f"{self.namespace}_current_fill",
             "Current number of visitors at the pool",
             ["pool_uid", "pool_name"],
+            registry=registry,
         )
 
         self.free_space = Gauge(
             f"{self.namespace}_free_space",
             "Available capacity remaining at the pool",
             ["pool_uid", "pool_name"],
+            registry=registry,
         )
 
         self.max_space = Gauge(
             f"{self.namespace}_max_space",
             "Maximum capacity of the pool",
             ["pool_uid", "pool_name"],
+            registry=registry,
         )
 
         self.occupancy_percentage = Gauge(
             f"{self.namespace}_occupancy_percentage",
             "Percentage of pool capacity currently in use",
             ["pool_uid", "pool_name"],
+            registry=registry,
         )
 
         self.water_temperature = Gauge(
             f"{self.namespace}_water_temperature",
             "Water temperature of the pool in degrees Celsius",
             ["pool_uid", "pool_name"],
+            registry=registry,
         )
+        self._server: WSGIServer | None = None
+        # Labelled children by pool uid, filled on first use so pools that
+        # never report data do not export a series
+        self._occupancy_by_uid: dict[str, _OccupancyGauges] = {}
+        self._water_temperature_by_uid: dict[str, Gauge] = {}
 
     def start_metrics_server(self) -> None:
         """Start Prometheus metrics HTTP server."""
-        start_http_server(self.config.metrics.port)
+        self._server, _ = start_http_server(
+            self.config.metrics.port, registry=self.registry
+        )
         logger.info(
             f"Metrics server started at http://localhost:{self.config.metrics.port}{self.config.metrics.endpoint}"
         )
 
+    def stop_metrics_server(self) -> None:
+        """Stop the Prometheus metrics HTTP server, if it is running."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
     def update_occupancy_metrics(self, pool_data: PoolOccupancyData) -> None:
         """Update occupancy metrics for a single pool."""
         pool_uid = pool_data.uid
-        if not pool_uid or pool_uid not in self.pool_uids:
-            return
-
-        pool_name = self.pool_uid_to_name.get(pool_uid, "Unknown")
+        # Pools seen before take a single dict lookup; the membership test
+        # only runs for new or unknown uids
+        gauges = self._occupancy_by_uid.get(pool_uid)
+        if gauges is None:
+            if not pool_uid or pool_uid not in self.pool_uids:
+                return
+            gauges = self._occupancy_gauges(pool_uid)
 
         # Get metrics values with fallbacks to 0
         current_fill = pool_data.currentfill
@@ -76,26 +120,41 @@ class PoolMetrics:
         max_space = pool_data.maxspace
 
         # Calculate occupancy percentage, handling potential division by zero
-        occupancy_percentage: float = 0
-        if max_space > 0:
-            occupancy_percentage = (current_fill / max_space) * 100
+        occupancy_percentage = (
+            current_fill * 100.0 / max_space if max_space > 0 else 0.0
+        )
 
         # Update Prometheus metrics
-        self.current_fill.labels(pool_uid=pool_uid, pool_name=pool_name).set(
-            current_fill
-        )
-        self.free_space.labels(pool_uid=pool_uid, pool_name=pool_name).set(free_space)
-        self.max_space.labels(pool_uid=pool_uid, pool_name=pool_name).set(max_space)
-        self.occupancy_percentage.labels(pool_uid=pool_uid, pool_name=pool_name).set(
-            occupancy_percentage
-        )
+        gauges.current_fill.set(current_fill)
+        gauges.free_space.set(free_space)
+        gauges.max_space.set(max_space)
+        gauges.occupancy_percentage.set(occupancy_percentage)
 
         logger.debug(
-            f"Updated metrics for pool {pool_name} (ID: {pool_uid}): "
-            f"current: {current_fill}, free: {free_space}, max: {max_space}, "
-            f"occupancy: {occupancy_percentage:.1f}%"
+            "Updated metrics for pool %s (ID: %s): "
+            "current: %s, free: %s, max: %s, occupancy: %.1f%%",
+            gauges.pool_name,
+            pool_uid,
+            current_fill,
+            free_space,
+            max_space,
+            occupancy_percentage,
         )
 
+    def _occupancy_gauges(self, pool_uid: str) -> _OccupancyGauges:
+        """Label and cache the occupancy gauges of a configured pool."""
+        pool_name = self.pool_uid_to_name.get(pool_uid, "Unknown")
+        labels = {"pool_uid": pool_uid, "pool_name": pool_name}
+        gauges = _OccupancyGauges(
+            pool_name=pool_name,
+            current_fill=self.current_fill.labels(**labels),
+            free_space=self.free_space.labels(**labels),
+            max_space=self.max_space.labels(**labels),
+            occupancy_percentage=self.occupancy_percentage.labels(**labels),
+        )
+        self._occupancy_by_uid[pool_uid] = gauges
+        return gauges
+
     def update_temperature_metrics(self, pool_data: TemperatureData) -> None:
         """Update temperature metrics for a single pool."""
         pool_uid = pool_data.pool_id
@@ -110,10 +169,16 @@ class PoolMetrics:
 
         temperature = pool_data.temperature
         if temperature is not None:
-            self.water_temperature.labels(pool_uid=pool_uid, pool_name=pool_name).set(
-                temperature
-            )
+            gauge = self._water_temperature_by_uid.get(pool_uid)
+            if gauge is None:
+                gauge = self.water_temperature.labels(
+                    pool_uid=pool_uid, pool_name=pool_name
+                )
+                self._water_temperature_by_uid[pool_uid] = gauge
+            gauge.set(temperature)
             logger.debug(
-                f"Updated temperature for pool {pool_name} (ID: {pool_uid}): "
-                f"{temperature}°C"
+                "Updated temperature for pool %s (ID: %s): %s°C",
+                pool_name,
+                pool_uid,
+                temperature,
             )
@@ -1,6 +1,7 @@
 import asyncio
 import json
 import logging
+import ssl
 from contextlib import suppress
 
 import websockets
@@ -25,7 +26,25 @@ class OccupancyCollector:
         self.open_timeout = config.occupancy.timeout_seconds
         self.ping_interval = config.occupancy.ping_interval_seconds
         self.ping_timeout = config.occupancy.ping_timeout_seconds
-        self.running = False
+        # Built once: loading the system CA store takes tens of milliseconds,
+        # which ssl=True would repeat on every reconnect
+        self._ssl_context = ssl.create_default_context()
+        # Set while the collector is stopped; waits on it end as soon as stop()
+        # is called instead of polling a flag
+        self._stop = asyncio.Event()
+        self._stop.set()
+        # Last published data per pool uid, to skip no-op updates
+        self._last_seen: dict[str, PoolOccupancyData] = {}
+
+    @property
+    def running(self) -> bool:
+        """Whether run() has been started and stop() not called since."""
+        return not self._stop.is_set()
+
+    async def _sleep(self, seconds: float) -> None:
+        """Sleep for the given time, returning early if the collector stops."""
+        with suppress(TimeoutError):
+            await asyncio.wait_for(self._stop.wait(), seconds)
 
     async def connect_websocket(self) -> ClientConnection | None:
         """Connect to the WebSocket API with retry logic."""
@@ -34,7 +53,7 @@ class OccupancyCollector:
                 logger.info(f"Connecting to WebSocket API at {self.websocket_url}")
                 websocket = await websockets.connect(
                     self.websocket_url,
-                    ssl=True,
+                    ssl=self._ssl_context,
                     open_timeout=self.open_timeout,
                     ping_interval=self.ping_interval,
                     ping_timeout=self.ping_timeout,
@@ -45,15 +64,19 @@ class OccupancyCollector:
             except WebSocketException as e:
                 logger.error(f"Failed to connect to WebSocket: {e}")
                 logger.info(f"Retrying in {self.retry_interval} seconds...")
-                await asyncio.sleep(self.retry_interval)
+                await self._sleep(self.retry_interval)
         return None
 
-    async def process_message(self, message: str) -> None:
-        """Process incoming WebSocket message."""
+    async def process_message(self, message: str | bytes) -> None:
+        """Process incoming WebSocket message.
+
+        Binary frames are decoded by json.loads directly, without an extra copy
+        into a str.
+        """
         try:
             raw_data = json.loads(message)
             if not isinstance(raw_data, list):
-                logger.warning(f"Unexpected data format: {message[:100]}")
+                logger.warning(f"Unexpected data format: {message[:100]!r}")
                 return
 
             pool_data_list: list[PoolOccupancyData] = [
@@ -62,16 +85,28 @@ class OccupancyCollector:
 
             # Update metrics for each pool
             for pool_data in pool_data_list:
-                self.metrics.update_occupancy_metrics(pool_data)
+                self._dispatch(pool_data)
 
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
-            logger.error(f"Failed to parse message: {e} - {message[:100]}")
+        # Malformed payloads are expected from time to time and are logged
+        # without a traceback; TypeError covers entries that are not objects
+        # and null fields. Anything else is a bug and gets the full traceback.
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Failed to parse message: {e} - {message[:100]!r}")
         except Exception as e:
             logger.exception(f"Error processing message: {e}")
 
+    def _dispatch(self, pool_data: PoolOccupancyData) -> None:
+        """Publish the occupancy of a single decoded pool."""
+        # Gauges keep their value, and the server repeats pools whose
+        # occupancy did not change, so only changed pools need to be written.
+        if self._last_seen.get(pool_data.uid) == pool_data:
+            return
+        self._last_seen[pool_data.uid] = pool_data
+        self.metrics.update_occupancy_metrics(pool_data)
+
     async def run(self) -> None:
         """Run the data collector loop."""
-        self.running = True
+        self._stop.clear()
 
         logger.info("Pool occupancy collector started")
 
@@ -89,10 +124,8 @@ class OccupancyCollector:
                 await websocket.send("all")
 
                 async for message in websocket:
-                    message_str = str(message)
-                    message_length = len(message_str)
-                    logger.debug(f"Received message of length {message_length}")
-                    await self.process_message(message_str)
+                    logger.debug(f"Received message of length {len(message)}")
+                    await self.process_message(message)
             except ConnectionClosed:
                 logger.warning("WebSocket connection closed")
             except Exception as e:
@@ -109,11 +142,11 @@ class OccupancyCollector:
                 # (not if it was explicitly stopped via stop() method)
                 if self.running:
                     logger.info(f"Reconnecting in {self.retry_interval} seconds...")
-                    await asyncio.sleep(self.retry_interval)
+                    await self._sleep(self.retry_interval)
 
         logger.info("Pool occupancy collector stopped")
 
     def stop(self) -> None:
         """Stop the data collector."""
         logger.info("Stopping pool occupancy collector")
-        self.running = False
+        self._stop.set()
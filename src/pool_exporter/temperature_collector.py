@@ -1,6 +1,13 @@
 import asyncio
+import io
 import logging
+import math
+import random
+import time
 import xml.etree.ElementTree as ET
+from collections.abc import Iterator
+from enum import Enum
+from typing import Literal
 
 import aiohttp
 
@@ -10,36 +17,147 @@ from pool_exporter.metrics import PoolMetrics
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for the exponential backoff after consecutive failed polls,
+# unless the poll interval itself is longer
+_MAX_BACKOFF_SECONDS = 3600
+# Consecutive failures counted towards the backoff; 2**16 is well past the cap
+# and keeps the exponent from overflowing during long outages
+_MAX_FAILURES = 16
+
+
+class _NotModified(Enum):
+    """Marker returned by a fetch when the server answered 304 Not Modified."""
+
+    NOT_MODIFIED = "not modified"
+
+
+_NOT_MODIFIED = _NotModified.NOT_MODIFIED
+# A fetched document, or the marker that the previous one is still current
+_Body = bytes | Literal[_NotModified.NOT_MODIFIED]
+
+
+def _iter_baths(xml_data: str | bytes) -> Iterator[ET.Element]:
+    """Yield each <bath> element as soon as it has been fully parsed.
+
+    Baths are detached from their parent once the caller is done with them,
+    so the partially built tree never holds more than one bath at a time.
+    """
+    source = (
+        io.BytesIO(xml_data) if isinstance(xml_data, bytes) else io.StringIO(xml_data)
+    )
+    parents: list[ET.Element] = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+
+        parents.pop()
+        if elem.tag == "bath":
+            yield elem
+            if parents:
+                parents[-1].remove(elem)
+
 
 class TemperatureCollector:
     """Collects temperature data from the Zürich swimming pool XML API."""
 
-    def __init__(self, config: AppConfig, metrics: PoolMetrics):
+    def __init__(
+        self,
+        config: AppConfig,
+        metrics: PoolMetrics,
+        session: aiohttp.ClientSession,
+    ):
         self.config = config
         self.metrics = metrics
+        self.session = session
         self.xml_url = config.temperature.url
         self.poll_interval = config.temperature.poll_interval_seconds
         self.timeout = config.temperature.timeout_seconds
+        connect_timeout = config.temperature.connect_timeout_seconds
+        sock_read_timeout = config.temperature.sock_read_timeout_seconds
+        # Bound each stage of a request so a stalled connect or body read fails
+        # early instead of using up the whole budget
+        self._client_timeout = aiohttp.ClientTimeout(
+            total=self.timeout,
+            connect=(
+                min(5, self.timeout / 3) if connect_timeout is None else connect_timeout
+            ),
+            sock_read=(
+                min(10, self.timeout)
+                if sock_read_timeout is None
+                else sock_read_timeout
+            ),
+        )
         self.running = False
+        self._failures = 0
+        # Validators of the last successful response, for conditional GETs
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        # Result of the last successful fetch as (monotonic time, body)
+        self._cache: tuple[float, _Body] | None = None
+        # Last published (temperature, status) per pool, to skip no-op updates
+        self._last_seen: dict[str | None, tuple[float | None, str | None]] = {}
+        self._hardcoded: tuple[TemperatureData, ...] = tuple(
+            TemperatureData(
+                pool_id=pool.uid,
+                title=pool.name,
+                temperature=pool.hardcoded_temperatur,
+            )
+            for pool in config.pools
+            if pool.hardcoded_temperatur
+        )
         self._publish_hard_coded()
 
-    async def fetch_temperature_data(self) -> str | None:
-        """Fetch temperature data from the XML API."""
+    async def fetch_temperature_data(self) -> _Body | None:
+        """Fetch temperature data from the XML API.
+
+        Returns None on failure and _NOT_MODIFIED if the data has not been
+        modified since the previous successful fetch. Successful results are
+        reused for half a poll interval, so callers outside the poll loop do
+        not cause extra requests.
+        """
+        now = time.monotonic()
+        if self._cache is not None and now - self._cache[0] < self.poll_interval / 2:
+            logger.debug("Serving temperature data from cache")
+            return self._cache[1]
+
+        body = await self._fetch_temperature_data()
+        if body is not None:
+            self._cache = (now, body)
+        return body
+
+    async def _fetch_temperature_data(self) -> _Body | None:
+        """Request the XML document from the API, bypassing the cache."""
         try:
             logger.info(f"Fetching temperature data from {self.xml_url}")
-            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            headers = {}
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+
+            async with self.session.get(
+                self.xml_url, headers=headers, timeout=self._client_timeout
+            ) as response:
+                if response.status == 304:
+                    logger.info("Temperature data not modified since last fetch")
+                    return _NOT_MODIFIED
 
-            async with (
-                aiohttp.ClientSession(timeout=timeout) as session,
-                session.get(self.xml_url) as response,
-            ):
                 if response.status != 200:
                     logger.error(
                         f"Failed to fetch temperature data: HTTP {response.status}"
                     )
                     return None
 
-                return await response.text()
+                # Hand the raw bytes to the XML parser, which honours the
+                # document's encoding declaration, instead of decoding first.
+                body = await response.read()
+                if not body:
+                    logger.error("Failed to fetch temperature data: empty response")
+                    return None
+                self._etag = response.headers.get("ETag")
+                self._last_modified = response.headers.get("Last-Modified")
+                return body
         except aiohttp.ClientError as e:
             logger.error(f"Error fetching temperature data: {e}")
             return None
@@ -47,63 +165,60 @@ class TemperatureCollector:
             logger.exception(f"Unexpected error fetching temperature data: {e}")
             return None
 
-    def parse_temperature_data(self, xml_data: str) -> list[TemperatureData]:
+    def parse_temperature_data(self, xml_data: str | bytes) -> list[TemperatureData]:
         """Parse temperature data from XML response."""
         try:
             logger.debug("Starting to parse XML temperature data")
-            root = ET.fromstring(xml_data)
             pool_data = []
 
-            pools = root.findall(".//bath")
-            logger.debug(f"Found {len(pools)} bath entries in XML")
-            for pool in pools:
-                pool_id = pool.find("poiid")
-                title = pool.find("title")
-                temperature = pool.find("temperatureWater")
-                status = pool.find("openClosedTextPlain")
-                date_modified = pool.find("dateModified")
-
-                if (
-                    pool_id is not None
-                    and temperature is not None
-                    and title is not None
-                ):
-                    pool_id_text = pool_id.text.lower() if pool_id.text else None
-                    pool_title_text = title.text.strip() if title.text else ""
-                    logger.debug(
-                        f"Processing pool with ID: {pool_id_text} and "
-                        f"name: {pool_title_text}"
+            for pool in _iter_baths(xml_data):
+                # findtext() returns the child's text directly (or None if the
+                # child is missing), avoiding a separate Element lookup and
+                # .text access per field.
+                pool_id = pool.findtext("poiid")
+                title = pool.findtext("title")
+                temperature = pool.findtext("temperatureWater")
+                status = pool.findtext("openClosedTextPlain")
+                date_modified = pool.findtext("dateModified")
+
+                if pool_id is None or title is None or temperature is None:
+                    continue
+
+                pool_id_text = pool_id.lower() or None
+                logger.debug(
+                    "Processing pool with ID: %s and name: %s",
+                    pool_id_text,
+                    title.strip(),
+                )
+
+                try:
+                    temp_value = float(temperature) if temperature else None
+                except ValueError as e:
+                    logger.warning(
+                        f"Could not parse temperature for pool {pool_id_text}: {e}"
+                    )
+                    continue
+                # float() also accepts "nan" and "inf", which must not reach
+                # the metrics
+                if temp_value is not None and not math.isfinite(temp_value):
+                    logger.warning(
+                        f"Ignoring non-finite temperature for pool {pool_id_text}: "
+                        f"{temperature!r}"
                     )
+                    continue
+                logger.debug(
+                    "Temperature value for pool %s: %s", pool_id_text, temp_value
+                )
 
-                    try:
-                        temp_value = (
-                            float(temperature.text) if temperature.text else None
-                        )
-                        logger.debug(
-                            f"Temperature value for pool {pool_id_text}: {temp_value}"
-                        )
-
-                        pool_data.append(
-                            TemperatureData(
-                                pool_id=pool_id_text,
-                                title=title.text,
-                                temperature=temp_value,
-                                status=(
-                                    status.text
-                                    if status is not None and status.text
-                                    else "Unknown"
-                                ),
-                                last_updated=(
-                                    date_modified.text
-                                    if date_modified is not None and date_modified.text
-                                    else None
-                                ),
-                            )
-                        )
-                    except (ValueError, TypeError) as e:
-                        logger.warning(
-                            f"Could not parse temperature for pool {pool_id_text}: {e}"
-                        )
+                pool_data.append(
+                    TemperatureData(
+                        pool_id=pool_id_text,
+                        title=title or None,
+                        temperature=temp_value,
+                        status=status or "Unknown",
+                        last_updated=date_modified or None,
+                    )
+                )
 
             logger.debug(f"Successfully parsed data for {len(pool_data)} pools")
             return pool_data
@@ -115,46 +230,89 @@ class TemperatureCollector:
             return []
 
     def update_metrics(self, pool_data: list[TemperatureData]) -> None:
+        last_seen = self._last_seen
         for pool in pool_data:
+            # Gauges keep their value between polls, so only pools whose
+            # reading changed since the previous poll need to be touched.
+            key = (pool.temperature, pool.status)
+            if last_seen.get(pool.pool_id) == key:
+                continue
+            last_seen[pool.pool_id] = key
             self.metrics.update_temperature_metrics(pool)
 
-    async def collect(self) -> None:
-        """Collect temperature data and update metrics."""
+    async def collect(self) -> bool:
+        """Collect temperature data and update metrics.
+
+        Returns False if the data could not be fetched, True otherwise.
+        """
         xml_data = await self.fetch_temperature_data()
-        if xml_data:
-            pool_data = self.parse_temperature_data(xml_data)
-            if pool_data:
-                logger.info(
-                    f"Successfully collected temperature data for "
-                    f"{len(pool_data)} pools"
-                )
-                self.update_metrics(pool_data)
-            else:
-                logger.warning("No temperature data was parsed from the XML response")
-        else:
+        if xml_data is None:
             logger.warning("Failed to fetch temperature data")
+            return False
+        if xml_data is _NOT_MODIFIED:
+            logger.debug("Temperature data unchanged, skipping parse")
+            return True
+
+        # Parse in a worker thread so the event loop stays free for the
+        # occupancy WebSocket while the document is processed.
+        pool_data = await asyncio.to_thread(self.parse_temperature_data, xml_data)
+        if pool_data:
+            logger.info(
+                f"Successfully collected temperature data for {len(pool_data)} pools"
+            )
+            self.update_metrics(pool_data)
+        else:
+            logger.warning("No temperature data was parsed from the XML response")
+        return True
+
+    def _next_delay(self) -> float:
+        """Return the number of seconds to wait before the next poll.
+
+        After consecutive failures the delay grows exponentially up to
+        _MAX_BACKOFF_SECONDS (or the poll interval, if that is longer), plus
+        random jitter, so an unavailable upstream is not hammered at a fixed
+        rate but is picked up again within the hour once it recovers.
+        """
+        if not self._failures:
+            return self.poll_interval
+
+        backoff = min(
+            self.poll_interval * 2.0**self._failures,
+            max(self.poll_interval, _MAX_BACKOFF_SECONDS),
+        )
+        return backoff + random.uniform(0, self.poll_interval)
 
     async def run(self) -> None:
         """Run the temperature collector."""
         self.running = True
+        # Re-publish in case the collector is restarted after a stop()
+        self._publish_hard_coded()
 
         logger.info(
             f"Temperature collector started with polling interval "
             f"of {self.poll_interval} seconds"
         )
 
+        loop = asyncio.get_running_loop()
         while self.running:
+            started = loop.time()
+            succeeded = False
             try:
-                await self.collect()
+                succeeded = await self.collect()
             except Exception as e:
                 logger.exception(f"Error in temperature collector: {e}")
 
+            self._failures = 0 if succeeded else min(self._failures + 1, _MAX_FAILURES)
+
             if self.running:
+                # Poll at a fixed rate: time spent fetching and parsing
+                # counts towards the interval instead of adding to it.
+                elapsed = loop.time() - started
+                delay = max(0.0, self._next_delay() - elapsed)
                 logger.debug(
-                    f"Waiting {self.poll_interval} seconds until "
-                    f"next temperature collection"
+                    f"Waiting {delay:.0f} seconds until next temperature collection"
                 )
-                await asyncio.sleep(self.poll_interval)
+                await asyncio.sleep(delay)
 
         logger.info("Temperature collector stopped")
 
@@ -164,12 +322,12 @@ class TemperatureCollector:
         self.running = False
 
     def _publish_hard_coded(self) -> None:
-        for pool in self.config.pools:
-            if not pool.hardcoded_temperatur:
-                continue
-            data = TemperatureData(
-                pool_id=pool.uid,
-                title=pool.name,
-                temperature=pool.hardcoded_temperatur,
-            )
+        # Hard-coded values may overwrite polled ones, so the next poll has to
+        # fetch the full document and publish everything again; a cached body
+        # or a 304 would leave the hard-coded values in place.
+        self._last_seen.clear()
+        self._etag = None
+        self._last_modified = None
+        self._cache = None
+        for data in self._hardcoded:
             self.metrics.update_temperature_metrics(data)
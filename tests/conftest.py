@@ -0,0 +1,72 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from prometheus_client import CollectorRegistry, Gauge
+
+from pool_exporter.config import (
+    AppConfig,
+    LoggingConfig,
+    MetricsConfig,
+    OccupancyConfig,
+    PoolConfig,
+    TemperatureConfig,
+)
+from pool_exporter.metrics import PoolMetrics
+
+
+@pytest.fixture(scope="session")
+def base_config() -> AppConfig:
+    """Create the configuration shared by all tests.
+
+    Tests must not modify it; use dataclasses.replace() to derive variants.
+    """
+    return AppConfig(
+        occupancy=OccupancyConfig(
+            url="wss://test.com/occupancy",
+            retry_interval_seconds=1,
+            timeout_seconds=5,
+            ping_interval_seconds=20.0,
+            ping_timeout_seconds=10.0,
+        ),
+        temperature=TemperatureConfig(
+            url="https://test.com/temperature.xml",
+            poll_interval_seconds=1,  # Short interval for testing
+            timeout_seconds=10,
+        ),
+        metrics=MetricsConfig(port=8000, endpoint="/metrics", namespace="zurich_pools"),
+        pools=[
+            PoolConfig(uid="SSD-1", name="Pool One", alt_uid="alt-1"),
+            PoolConfig(uid="SSD-2", name="Pool Two"),
+            PoolConfig(uid="SSD-3", name="Pool Three", hardcoded_temperatur=25),
+        ],
+        logging=LoggingConfig(level="INFO", format="%(message)s"),
+    )
+
+
+@pytest.fixture(scope="session")
+def mock_config(base_config: AppConfig) -> AppConfig:
+    """Create a mock configuration for testing."""
+    return base_config
+
+
+def build_metrics(config: AppConfig, registry: CollectorRegistry) -> PoolMetrics:
+    """Create PoolMetrics with its gauges on a custom registry."""
+    return PoolMetrics(config, registry)
+
+
+def _fake_gauge(
+    name: str, doc: str, labelnames: list[str], registry: CollectorRegistry
+) -> MagicMock:
+    gauge = MagicMock(spec=Gauge)
+    gauge._name = name
+    return gauge
+
+
+def build_fake_metrics(config: AppConfig) -> PoolMetrics:
+    """Create PoolMetrics with mock gauges.
+
+    For tests that never read metric values, this skips the registry
+    bookkeeping a real Gauge does.
+    """
+    with patch("pool_exporter.metrics.Gauge", side_effect=_fake_gauge):
+        return PoolMetrics(config)
@@ -176,6 +176,20 @@ def test_temperature_data_immutable() -> None:
         temp_data.temperature = 30.0  # type: ignore[misc]
 
 
+@pytest.mark.parametrize(
+    "instance",
+    [
+        PoolOccupancyData(
+            uid="SSD-1", name="Test Pool", freespace=50, maxspace=100, currentfill=50
+        ),
+        TemperatureData(pool_id="SSD-1", temperature=25.5, title="Test Pool"),
+    ],
+)
+def test_api_types_use_slots(instance: object) -> None:
+    """Test that API types are slotted and carry no per-instance __dict__."""
+    assert not hasattr(instance, "__dict__")
+
+
 def test_temperature_data_default_status() -> None:
     """Test TemperatureData with default status value."""
     temp_data = TemperatureData(
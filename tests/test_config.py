@@ -1,3 +1,4 @@
+from dataclasses import FrozenInstanceError
 from pathlib import Path
 from unittest.mock import mock_open, patch
 
@@ -63,6 +64,8 @@ logging:
     assert config.temperature.url == "https://example.com/temperature.xml"
     assert config.temperature.poll_interval_seconds == 300
     assert config.temperature.timeout_seconds == 10
+    assert config.temperature.connect_timeout_seconds is None
+    assert config.temperature.sock_read_timeout_seconds is None
 
     assert config.metrics.port == 8000
     assert config.metrics.endpoint == "/metrics"
@@ -163,7 +166,7 @@ logging:
 
 
 def test_config_dataclasses_immutable() -> None:
-    """Test that config dataclasses can be instantiated."""
+    """Test that config dataclasses can be instantiated but not modified."""
     occupancy = OccupancyConfig(
         url="wss://test.com",
         retry_interval_seconds=10,
@@ -199,3 +202,8 @@ def test_config_dataclasses_immutable() -> None:
         logging=logging_config,
     )
     assert isinstance(app_config, AppConfig)
+
+    with pytest.raises(FrozenInstanceError):
+        app_config.metrics = metrics  # type: ignore[misc]
+    with pytest.raises(FrozenInstanceError):
+        pool.uid = "SSD-2"  # type: ignore[misc]
@@ -1,24 +1,92 @@
+import asyncio
+import logging
 import os
 import re
+import socket
 import subprocess
 import sys
+import threading
 import time
+from collections.abc import Iterator
+from dataclasses import replace
 from pathlib import Path
 
 import pytest
 import requests
+from prometheus_client import CollectorRegistry
+
+from pool_exporter.config import load_config
+from pool_exporter.exporter import run_exporter
+
+# a bit unfortunate that we cannot reliably e2e-test the temperature
+# API, as during winter time, there is no temperature data available.
+_METRICS_RE = re.compile(
+    r"zurich_pools_(?P<metric>water_temperature|max_space)"
+    r'\{pool_name="Hallenbad Oerlikon",pool_uid="SSD-7"\} ([0-9]*\.?[0-9]+)'
+)
+_EXPECTED_METRICS = frozenset({"water_temperature", "max_space"})
+
+
+def _wait_for_metrics(
+    session: requests.Session,
+    url: str,
+    deadline: float = 15.0,
+    process: subprocess.Popen[str] | None = None,
+) -> requests.Response:
+    """Poll the metrics endpoint until all expected series are present.
+
+    If the exporter runs in a process, fail as soon as that process exits.
+    """
+    start = time.monotonic()
+    last_error = "no response"
+    while time.monotonic() < start + deadline:
+        if process is not None and process.poll() is not None:
+            stdout, stderr = process.communicate()
+            pytest.fail(
+                f"Process terminated unexpectedly. stdout: {stdout}, stderr: {stderr}"
+            )
+        try:
+            response = session.get(url, timeout=0.2)
+        except requests.RequestException as e:
+            last_error = str(e)
+        else:
+            if response.status_code == 200:
+                found = {m["metric"] for m in _METRICS_RE.finditer(response.text)}
+                if found >= _EXPECTED_METRICS:
+                    return response
+            last_error = f"HTTP {response.status_code}: {response.text}"
+        time.sleep(0.1)
+
+    pytest.fail(
+        f"Metrics not ready after {deadline} seconds. Last result: {last_error}"
+    )
+
+
+def _free_port() -> int:
+    """Return a TCP port that is currently free on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return int(sock.getsockname()[1])
 
 
 @pytest.fixture
+def http_session() -> Iterator[requests.Session]:
+    """Keep-alive HTTP session shared by all requests of a test."""
+    with requests.Session() as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
 def project_root() -> Path:
     """Get the project root directory."""
     root = Path(__file__).parent.parent
-    files = os.listdir(root)
-    assert "pyproject.toml" in files, "pyproject.toml not found in project root"
+    assert (root / "pyproject.toml").is_file(), (
+        "pyproject.toml not found in project root"
+    )
     return root
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def config_file(project_root: Path) -> Path:
     """Get the path to the config file."""
     config_path = project_root / "config.yml"
@@ -28,10 +96,56 @@ def config_file(project_root: Path) -> Path:
 
 
 def test_e2e_exporter_loads_config_and_serves_metrics(
-    project_root: Path, config_file: Path
+    config_file: Path,
+    http_session: requests.Session,
+    caplog: pytest.LogCaptureFixture,
 ) -> None:
     """
-    Test that exporter.py can load the configuration
+    Test that the exporter can load the configuration
+    file and serve metrics endpoint.
+    """
+    caplog.set_level(logging.INFO)
+    config = load_config(config_file)
+    port = _free_port()
+    config = replace(config, metrics=replace(config.metrics, port=port))
+
+    # Run the exporter on its own event loop in a background thread, with a
+    # private registry so its gauges do not leak into other tests
+    started = threading.Event()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(
+        target=loop.run_until_complete,
+        args=(run_exporter(config, started, CollectorRegistry()),),
+        daemon=True,
+    )
+    thread.start()
+
+    def cancel_all() -> None:
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+
+    try:
+        assert started.wait(timeout=5), "Metrics server did not start"
+        _wait_for_metrics(http_session, f"http://localhost:{port}/metrics")
+    finally:
+        loop.call_soon_threadsafe(cancel_all)
+        thread.join(timeout=5)
+        if not thread.is_alive():
+            loop.close()
+
+    # Should see the metrics server startup message
+    expected_metrics_msg = f"Metrics server started at http://localhost:{port}/metrics"
+    assert expected_metrics_msg in caplog.text
+
+    assert not [r for r in caplog.records if r.levelno == logging.WARNING]
+
+
+@pytest.mark.slow
+def test_e2e_exporter_subprocess_serves_metrics(
+    project_root: Path, config_file: Path, http_session: requests.Session
+) -> None:
+    """
+    Test that `python -m pool_exporter` can load the configuration
     file and serve metrics endpoint.
     """
     # Change to project root directory so config.yml can be found
@@ -47,50 +161,14 @@ def test_e2e_exporter_loads_config_and_serves_metrics(
             text=True,
         )
 
-        # Let it run to allow metrics server to start and collect data
-        time.sleep(10)
-
-        # Check if the process is still running (it should be)
-        if process.poll() is not None:
-            stdout, stderr = process.communicate()
-            pytest.fail(
-                f"Process terminated unexpectedly. stdout: {stdout}, stderr: {stderr}"
-            )
-
-        try:
-            # Test the metrics endpoint
-            response = requests.get("http://localhost:8000/metrics", timeout=5)
-        except requests.exceptions.RequestException as e:
-            pytest.fail(f"Failed to access metrics endpoint: {e}")
-        else:
-            assert response.status_code == 200, (
-                f"Metrics endpoint returned {response.status_code}"
-            )
-            metrics_content = response.text
-
-            for regex in [
-                (
-                    # a bit unfortunate that we cannot reliably e2e-test the temperature
-                    # API, as during winter time, there is no temperature data
-                    # available.
-                    r'zurich_pools_water_temperature\{pool_name="Hallenbad Oerlikon",'
-                    r'pool_uid="SSD-7"\} ([0-9]*\.?[0-9]+)'
-                ),
-                (
-                    r'zurich_pools_max_space\{pool_name="Hallenbad Oerlikon",'
-                    r'pool_uid="SSD-7"\} ([0-9]*\.?[0-9]+)'
-                ),
-            ]:
-                match = re.search(regex, metrics_content)
-                assert match is not None, (
-                    f"Expected metric pattern '{regex}' not found in metrics output. "
-                    f"Got: {metrics_content}"
-                )
+        _wait_for_metrics(
+            http_session, "http://localhost:8000/metrics", process=process
+        )
 
         # Terminate the process
         process.terminate()
         try:
-            stdout, stderr = process.communicate(timeout=5)
+            stdout, stderr = process.communicate(timeout=2)
         except subprocess.TimeoutExpired:
             process.kill()
             stdout, stderr = process.communicate()
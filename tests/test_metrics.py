@@ -1,80 +1,47 @@
-from unittest.mock import patch
+from dataclasses import replace
+from types import MappingProxyType
+from typing import cast
+from unittest.mock import MagicMock, patch
 
 import pytest
-from prometheus_client import CollectorRegistry, Gauge
+from conftest import build_fake_metrics, build_metrics
+from prometheus_client import CollectorRegistry
 
 from pool_exporter.api_types import PoolOccupancyData, TemperatureData
-from pool_exporter.config import (
-    AppConfig,
-    LoggingConfig,
-    MetricsConfig,
-    OccupancyConfig,
-    PoolConfig,
-    TemperatureConfig,
-)
+from pool_exporter.config import AppConfig
 from pool_exporter.metrics import PoolMetrics
 
 
-@pytest.fixture
-def mock_config() -> AppConfig:
-    """Create a mock configuration for testing."""
-    return AppConfig(
-        occupancy=OccupancyConfig(
-            url="wss://test.com",
-            retry_interval_seconds=10,
-            timeout_seconds=5,
-            ping_interval_seconds=20.0,
-            ping_timeout_seconds=10.0,
-        ),
-        temperature=TemperatureConfig(
-            url="https://test.com", poll_interval_seconds=300, timeout_seconds=10
-        ),
-        metrics=MetricsConfig(port=8000, endpoint="/metrics", namespace="zurich_pools"),
-        pools=[
-            PoolConfig(uid="SSD-1", name="Pool One", alt_uid="alt-1"),
-            PoolConfig(uid="SSD-2", name="Pool Two"),
-            PoolConfig(uid="SSD-3", name="Pool Three", hardcoded_temperatur=25),
-        ],
-        logging=LoggingConfig(level="INFO", format="%(message)s"),
-    )
-
-
 @pytest.fixture
 def custom_registry() -> CollectorRegistry:
     """Create a custom Prometheus registry for each test to avoid conflicts."""
     return CollectorRegistry()
 
 
-def _create_pool_metrics(config: AppConfig, registry: CollectorRegistry) -> PoolMetrics:
-    """Helper to create PoolMetrics with mocked server and custom registry."""
-    with (
-        patch("pool_exporter.metrics.start_http_server"),
-        patch("pool_exporter.metrics.Gauge") as mock_gauge,
-    ):
-
-        def create_gauge(name: str, doc: str, labelnames: list[str]) -> Gauge:
-            return Gauge(name, doc, labelnames, registry=registry)
-
-        mock_gauge.side_effect = create_gauge
-        return PoolMetrics(config)
+@pytest.fixture
+def fake_metrics(mock_config: AppConfig) -> PoolMetrics:
+    """Create a PoolMetrics instance with mock gauges."""
+    return build_fake_metrics(mock_config)
 
 
 @pytest.fixture
 def metrics(mock_config: AppConfig, custom_registry: CollectorRegistry) -> PoolMetrics:
     """Create a PoolMetrics instance with mocked metrics server and custom registry."""
-    return _create_pool_metrics(mock_config, custom_registry)
+    return build_metrics(mock_config, custom_registry)
 
 
 def test_metrics_initialization(
     mock_config: AppConfig, custom_registry: CollectorRegistry
 ) -> None:
     """Test that PoolMetrics initializes correctly."""
-    metrics = _create_pool_metrics(mock_config, custom_registry)
+    metrics = build_metrics(mock_config, custom_registry)
 
     assert metrics.namespace == "zurich_pools"
     assert metrics.pool_uids == {"SSD-1", "SSD-2", "SSD-3"}
+    assert isinstance(metrics.pool_uids, frozenset)
     assert metrics.pool_names == {"Pool One", "Pool Two", "Pool Three"}
     assert metrics.pool_alt_uid_to_uid == {"alt-1": "SSD-1"}
+    assert isinstance(metrics.pool_alt_uid_to_uid, MappingProxyType)
     assert metrics.pool_uid_to_name == {
         "SSD-1": "Pool One",
         "SSD-2": "Pool Two",
@@ -82,95 +49,56 @@ def test_metrics_initialization(
     }
 
 
-def test_start_metrics_server(
-    mock_config: AppConfig, custom_registry: CollectorRegistry
+def test_metrics_initialization_rejects_too_many_pools(
+    mock_config: AppConfig,
 ) -> None:
-    """Test that metrics server starts correctly."""
+    """Test that more pools than metrics.max_pools is a configuration error."""
+    config = replace(mock_config, metrics=replace(mock_config.metrics, max_pools=2))
+
     with (
-        patch("pool_exporter.metrics.start_http_server") as mock_start,
         patch("pool_exporter.metrics.Gauge") as mock_gauge,
+        pytest.raises(ValueError, match="3 pools configured"),
     ):
+        PoolMetrics(config)
 
-        def create_gauge(name: str, doc: str, labelnames: list[str]) -> Gauge:
-            return Gauge(name, doc, labelnames, registry=custom_registry)
+    mock_gauge.assert_not_called()
 
-        mock_gauge.side_effect = create_gauge
-        metrics = PoolMetrics(mock_config)
+
+def test_start_metrics_server(
+    mock_config: AppConfig, custom_registry: CollectorRegistry
+) -> None:
+    """Test that metrics server starts correctly."""
+    metrics = build_metrics(mock_config, custom_registry)
+    with patch(
+        "pool_exporter.metrics.start_http_server",
+        return_value=(MagicMock(), MagicMock()),
+    ) as mock_start:
         metrics.start_metrics_server()
 
     # Should be called once during start_metrics_server() call
     assert mock_start.call_count == 1
-    mock_start.assert_called_with(8000)
-
-
-def test_update_occupancy_metrics_valid_data(metrics: PoolMetrics) -> None:
-    """Test updating occupancy metrics with valid data."""
-    pool_data = PoolOccupancyData(
-        uid="SSD-1",
-        name="Pool One",
-        freespace=50,
-        maxspace=100,
-        currentfill=50,
-    )
-
-    metrics.update_occupancy_metrics(pool_data)
-
-    # Verify that the metrics were set (we can't easily inspect Gauge values,
-    # but we can verify the method runs without error)
-    assert metrics.current_fill.labels(pool_uid="SSD-1", pool_name="Pool One")
-    assert metrics.free_space.labels(pool_uid="SSD-1", pool_name="Pool One")
-    assert metrics.max_space.labels(pool_uid="SSD-1", pool_name="Pool One")
-    assert metrics.occupancy_percentage.labels(pool_uid="SSD-1", pool_name="Pool One")
-
-
-def test_update_occupancy_metrics_zero_max_space(metrics: PoolMetrics) -> None:
-    """Test updating occupancy metrics with zero max space
-    (division by zero edge case)."""
-    pool_data = PoolOccupancyData(
-        uid="SSD-1",
-        name="Pool One",
-        freespace=0,
-        maxspace=0,  # Edge case: division by zero
-        currentfill=0,
-    )
-
-    # Should not raise an exception
-    metrics.update_occupancy_metrics(pool_data)
-
-    # Verify metrics exist
-    assert metrics.current_fill.labels(pool_uid="SSD-1", pool_name="Pool One")
-    assert metrics.occupancy_percentage.labels(pool_uid="SSD-1", pool_name="Pool One")
-
+    mock_start.assert_called_with(8000, registry=custom_registry)
 
-def test_update_occupancy_metrics_unknown_pool(metrics: PoolMetrics) -> None:
-    """Test that metrics for unknown pools are ignored."""
-    pool_data = PoolOccupancyData(
-        uid="UNKNOWN-POOL",
-        name="Unknown Pool",
-        freespace=50,
-        maxspace=100,
-        currentfill=50,
-    )
-
-    # Should not raise an exception, but should be ignored
-    metrics.update_occupancy_metrics(pool_data)
 
+def test_stop_metrics_server(
+    mock_config: AppConfig, custom_registry: CollectorRegistry
+) -> None:
+    """Test that stopping shuts the server down once and is safe to repeat."""
+    metrics = build_metrics(mock_config, custom_registry)
+    server = MagicMock()
+    with patch(
+        "pool_exporter.metrics.start_http_server", return_value=(server, MagicMock())
+    ):
+        metrics.start_metrics_server()
 
-def test_update_occupancy_metrics_empty_uid(metrics: PoolMetrics) -> None:
-    """Test that metrics with empty UID are ignored."""
-    pool_data = PoolOccupancyData(
-        uid="",
-        name="Pool One",
-        freespace=50,
-        maxspace=100,
-        currentfill=50,
-    )
+    metrics.stop_metrics_server()
+    metrics.stop_metrics_server()
 
-    # Should not raise an exception, but should be ignored
-    metrics.update_occupancy_metrics(pool_data)
+    server.shutdown.assert_called_once_with()
+    server.server_close.assert_called_once_with()
 
 
-def test_update_temperature_metrics_valid_data(metrics: PoolMetrics) -> None:
+def test_update_temperature_metrics_valid_data(fake_metrics: PoolMetrics) -> None:
     """Test updating temperature metrics with valid data."""
     temp_data = TemperatureData(
         pool_id="SSD-1",
@@ -179,13 +107,16 @@ def test_update_temperature_metrics_valid_data(metrics: PoolMetrics) -> None:
         status="Open",
     )
 
-    metrics.update_temperature_metrics(temp_data)
+    fake_metrics.update_temperature_metrics(temp_data)
 
     # Verify that the metric was set
-    assert metrics.water_temperature.labels(pool_uid="SSD-1", pool_name="Pool One")
+    water_temperature = cast(MagicMock, fake_metrics.water_temperature)
+    labels = water_temperature.labels
+    labels.assert_called_once_with(pool_uid="SSD-1", pool_name="Pool One")
+    labels.return_value.set.assert_called_once_with(25.5)
 
 
-def test_update_temperature_metrics_with_alt_uid(metrics: PoolMetrics) -> None:
+def test_update_temperature_metrics_with_alt_uid(fake_metrics: PoolMetrics) -> None:
     """Test updating temperature metrics using alternate UID."""
     temp_data = TemperatureData(
         pool_id="alt-1",  # This should map to SSD-1
@@ -193,10 +124,35 @@ def test_update_temperature_metrics_with_alt_uid(metrics: PoolMetrics) -> None:
         title="Pool One",
     )
 
-    metrics.update_temperature_metrics(temp_data)
+    fake_metrics.update_temperature_metrics(temp_data)
 
     # Should use the mapped UID
-    assert metrics.water_temperature.labels(pool_uid="SSD-1", pool_name="Pool One")
+    water_temperature = cast(MagicMock, fake_metrics.water_temperature)
+    water_temperature.labels.assert_called_once_with(
+        pool_uid="SSD-1", pool_name="Pool One"
+    )
+
+
+def test_update_temperature_metrics_reuses_labelled_gauge(
+    metrics: PoolMetrics, custom_registry: CollectorRegistry
+) -> None:
+    """Test that the labelled gauge is looked up once per pool."""
+    with patch.object(
+        metrics.water_temperature, "labels", wraps=metrics.water_temperature.labels
+    ) as mock_labels:
+        for temperature in (25.5, 26.0):
+            metrics.update_temperature_metrics(
+                TemperatureData(pool_id="SSD-1", temperature=temperature, title="")
+            )
+
+    mock_labels.assert_called_once_with(pool_uid="SSD-1", pool_name="Pool One")
+    assert (
+        custom_registry.get_sample_value(
+            f"{metrics.namespace}_water_temperature",
+            {"pool_uid": "SSD-1", "pool_name": "Pool One"},
+        )
+        == 26.0
+    )
 
 
 @pytest.mark.parametrize(
@@ -214,7 +170,7 @@ def test_update_temperature_metrics_with_alt_uid(metrics: PoolMetrics) -> None:
     ],
 )
 def test_update_temperature_metrics_edge_cases(
-    metrics: PoolMetrics,
+    fake_metrics: PoolMetrics,
     pool_id: str | None,
     temperature: float | None,
     title: str,
@@ -228,18 +184,22 @@ def test_update_temperature_metrics_edge_cases(
     )
 
     # Should not raise an exception
-    metrics.update_temperature_metrics(temp_data)
+    fake_metrics.update_temperature_metrics(temp_data)
 
     # Verify metric was set only when expected
+    water_temperature = cast(MagicMock, fake_metrics.water_temperature)
+    labels = water_temperature.labels
     if should_set_metric:
-        assert metrics.water_temperature.labels(pool_uid="SSD-1", pool_name="Pool One")
+        labels.assert_called_once_with(pool_uid="SSD-1", pool_name="Pool One")
+    else:
+        labels.assert_not_called()
 
 
 def test_metrics_namespace_in_metric_names(
     mock_config: AppConfig, custom_registry: CollectorRegistry
 ) -> None:
     """Test that metrics use the configured namespace."""
-    metrics = _create_pool_metrics(mock_config, custom_registry)
+    metrics = build_metrics(mock_config, custom_registry)
 
     assert metrics.current_fill._name == "zurich_pools_current_fill"
     assert metrics.free_space._name == "zurich_pools_free_space"
@@ -248,35 +208,84 @@ def test_metrics_namespace_in_metric_names(
     assert metrics.water_temperature._name == "zurich_pools_water_temperature"
 
 
-def test_update_occupancy_metrics_full_capacity(metrics: PoolMetrics) -> None:
-    """Test updating occupancy metrics at full capacity."""
+_OCCUPANCY_CASES = [
+    pytest.param("SSD-1", 50, 100, 50, True, id="valid"),
+    pytest.param("SSD-1", 0, 0, 0, True, id="zero-max-space"),
+    pytest.param("UNKNOWN-POOL", 50, 100, 50, False, id="unknown-pool"),
+    pytest.param("", 50, 100, 50, False, id="empty-uid"),
+    pytest.param("SSD-2", 0, 100, 100, True, id="full-capacity"),
+    pytest.param("SSD-2", -10, 100, 110, True, id="over-capacity"),
+]
+
+
+@pytest.mark.parametrize("uid,free,maxsp,cur,expect_set", _OCCUPANCY_CASES)
+def test_update_occupancy_metrics(
+    metrics: PoolMetrics,
+    custom_registry: CollectorRegistry,
+    uid: str,
+    free: int,
+    maxsp: int,
+    cur: int,
+    expect_set: bool,
+) -> None:
+    """Test that occupancy metrics are set for configured pools only."""
     pool_data = PoolOccupancyData(
-        uid="SSD-2",
-        name="Pool Two",
-        freespace=0,
-        maxspace=100,
-        currentfill=100,
+        uid=uid, name="Any Name", freespace=free, maxspace=maxsp, currentfill=cur
     )
 
+    # Should not raise an exception, including on zero or exceeded capacity
     metrics.update_occupancy_metrics(pool_data)
 
-    # Verify metrics exist
-    assert metrics.current_fill.labels(pool_uid="SSD-2", pool_name="Pool Two")
-    assert metrics.free_space.labels(pool_uid="SSD-2", pool_name="Pool Two")
+    labels = {
+        "pool_uid": uid,
+        "pool_name": metrics.pool_uid_to_name.get(uid, "Unknown"),
+    }
+    expected = {
+        "current_fill": cur,
+        "free_space": free,
+        "max_space": maxsp,
+        "occupancy_percentage": cur * 100 / maxsp if maxsp else 0,
+    }
+    for name, value in expected.items():
+        sample = custom_registry.get_sample_value(f"{metrics.namespace}_{name}", labels)
+        assert sample == (value if expect_set else None)
 
 
-def test_update_occupancy_metrics_over_capacity(metrics: PoolMetrics) -> None:
-    """Test updating occupancy metrics when over capacity (edge case)."""
+@pytest.mark.parametrize("uid", ["UNKNOWN-POOL", ""])
+def test_update_occupancy_metrics_rejects_before_labelling(
+    fake_metrics: PoolMetrics, uid: str
+) -> None:
+    """Test that rejected pools return before any labelled gauge is looked up."""
     pool_data = PoolOccupancyData(
-        uid="SSD-2",
-        name="Pool Two",
-        freespace=-10,  # Negative free space
-        maxspace=100,
-        currentfill=110,  # Over capacity
+        uid=uid, name="Any Name", freespace=50, maxspace=100, currentfill=50
     )
 
-    # Should not raise an exception
-    metrics.update_occupancy_metrics(pool_data)
+    fake_metrics.update_occupancy_metrics(pool_data)
 
-    # Verify metrics exist
-    assert metrics.current_fill.labels(pool_uid="SSD-2", pool_name="Pool Two")
+    for gauge in (
+        fake_metrics.current_fill,
+        fake_metrics.free_space,
+        fake_metrics.max_space,
+        fake_metrics.occupancy_percentage,
+    ):
+        assert cast(MagicMock, gauge).labels.call_count == 0
+
+
+def test_update_occupancy_metrics_reuses_labelled_gauges(
+    fake_metrics: PoolMetrics,
+) -> None:
+    """Test that the labelled occupancy gauges are looked up once per pool."""
+    for currentfill in (50, 60):
+        fake_metrics.update_occupancy_metrics(
+            PoolOccupancyData(
+                uid="SSD-1",
+                name="Pool One",
+                freespace=100 - currentfill,
+                maxspace=100,
+                currentfill=currentfill,
+            )
+        )
+
+    fill = cast(MagicMock, fake_metrics.current_fill).labels
+    fill.assert_called_once_with(pool_uid="SSD-1", pool_name="Pool One")
+    assert fill.return_value.set.call_args_list == [((50,),), ((60,),)]
@@ -1,169 +1,176 @@
 import asyncio
 import json
+import logging
+import ssl
 from collections.abc import AsyncGenerator
+from dataclasses import replace
 from unittest.mock import AsyncMock, patch
 
 import pytest
-from prometheus_client import CollectorRegistry, Gauge
+from conftest import build_fake_metrics
 from websockets.exceptions import ConnectionClosed, WebSocketException
 
 from pool_exporter.api_types import PoolOccupancyData
-from pool_exporter.config import (
-    AppConfig,
-    LoggingConfig,
-    MetricsConfig,
-    OccupancyConfig,
-    PoolConfig,
-    TemperatureConfig,
-)
+from pool_exporter.config import AppConfig
 from pool_exporter.metrics import PoolMetrics
 from pool_exporter.occupancy_collector import OccupancyCollector
 
-
-@pytest.fixture
-def mock_config() -> AppConfig:
-    """Create a mock configuration for testing."""
-    return AppConfig(
-        occupancy=OccupancyConfig(
-            url="wss://test.com/occupancy",
-            retry_interval_seconds=1,
-            timeout_seconds=5,
-            ping_interval_seconds=20.0,
-            ping_timeout_seconds=10.0,
-        ),
-        temperature=TemperatureConfig(
-            url="https://test.com", poll_interval_seconds=300, timeout_seconds=10
-        ),
-        metrics=MetricsConfig(port=8000, endpoint="/metrics", namespace="zurich_pools"),
-        pools=[
-            PoolConfig(uid="SSD-1", name="Pool One"),
-            PoolConfig(uid="SSD-2", name="Pool Two"),
-        ],
-        logging=LoggingConfig(level="INFO", format="%(message)s"),
-    )
+# Serialized once at import time and shared by the tests below
+_MSG_ONE_POOL = json.dumps(
+    [
+        {
+            "uid": "SSD-1",
+            "name": "Pool One",
+            "freespace": 50,
+            "maxspace": 100,
+            "currentfill": "50",
+        }
+    ]
+)
+_MSG_TWO_POOLS = json.dumps(
+    [
+        {
+            "uid": "SSD-1",
+            "name": "Pool One",
+            "freespace": 50,
+            "maxspace": 100,
+            "currentfill": "50",
+        },
+        {
+            "uid": "SSD-2",
+            "name": "Pool Two",
+            "freespace": 25,
+            "maxspace": 75,
+            "currentfill": "50",
+        },
+    ]
+)
+_MSG_ZERO_CAP = json.dumps(
+    [
+        {
+            "uid": "SSD-1",
+            "name": "Pool One",
+            "freespace": 0,
+            "maxspace": 0,  # Edge case: zero capacity
+            "currentfill": "0",
+        }
+    ]
+)
+_INVALID_MESSAGES = [
+    "not valid json {[",  # Invalid JSON
+    json.dumps({"uid": "SSD-1", "name": "Pool One"}),  # Wrong format (not a list)
+    json.dumps([{"uid": "SSD-1", "name": "Pool One"}]),  # Missing required fields
+    json.dumps(["SSD-1", "SSD-2"]),  # Entries are not objects
+    json.dumps(  # Null field
+        [
+            {
+                "uid": "SSD-1",
+                "name": "Pool One",
+                "freespace": None,
+                "maxspace": 100,
+                "currentfill": 50,
+            }
+        ]
+    ),
+]
 
 
-@pytest.fixture
-def custom_registry() -> CollectorRegistry:
-    """Create a custom Prometheus registry for each test to avoid conflicts."""
-    return CollectorRegistry()
+@pytest.fixture(scope="module")
+def mock_config(base_config: AppConfig) -> AppConfig:
+    """Create a mock configuration with the two pools used by these tests."""
+    return replace(base_config, pools=base_config.pools[:2])
 
 
 @pytest.fixture
-def mock_metrics(
-    mock_config: AppConfig, custom_registry: CollectorRegistry
-) -> PoolMetrics:
-    """Create a mock PoolMetrics instance with custom registry."""
-    with (
-        patch("pool_exporter.metrics.start_http_server"),
-        patch("pool_exporter.metrics.Gauge") as mock_gauge,
-    ):
+def mock_metrics(mock_config: AppConfig) -> PoolMetrics:
+    """Create a PoolMetrics instance with mock gauges."""
+    return build_fake_metrics(mock_config)
 
-        def create_gauge(name: str, doc: str, labelnames: list[str]) -> Gauge:
-            return Gauge(name, doc, labelnames, registry=custom_registry)
 
-        mock_gauge.side_effect = create_gauge
-        return PoolMetrics(mock_config)
+@pytest.fixture
+def mock_websocket() -> AsyncMock:
+    """Create a mock websocket; send() and close() are AsyncMock children."""
+    return AsyncMock()
 
 
 @pytest.fixture
 def collector(mock_config: AppConfig, mock_metrics: PoolMetrics) -> OccupancyCollector:
-    """Create an OccupancyCollector instance."""
-    return OccupancyCollector(mock_config, mock_metrics)
+    """Create an OccupancyCollector instance.
+
+    Retry and reconnect waits are zeroed so no test sleeps for real. Tests of
+    stop() interrupting a wait set a long interval themselves.
+    """
+    collector = OccupancyCollector(mock_config, mock_metrics)
+    collector.retry_interval = 0
+    return collector
 
 
 @pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "message,expected",
+    [
+        (_MSG_ONE_POOL, [("SSD-1", 100, 50)]),
+        (_MSG_TWO_POOLS, [("SSD-1", 100, 50), ("SSD-2", 75, 50)]),
+        (_MSG_ZERO_CAP, [("SSD-1", 0, 0)]),  # Edge case: zero capacity
+        (_MSG_ONE_POOL.encode(), [("SSD-1", 100, 50)]),  # Binary frame
+    ],
+)
 async def test_process_message_valid_data(
-    collector: OccupancyCollector, mock_metrics: PoolMetrics
+    collector: OccupancyCollector,
+    message: str | bytes,
+    expected: list[tuple[str, int, int]],
 ) -> None:
-    """Test processing a valid WebSocket message."""
-    message = json.dumps(
-        [
-            {
-                "uid": "SSD-1",
-                "name": "Pool One",
-                "freespace": 50,
-                "maxspace": 100,
-                "currentfill": "50",
-            }
-        ]
-    )
-
-    with patch.object(mock_metrics, "update_occupancy_metrics") as mock_update:
+    """Test decoding valid WebSocket messages into pool data."""
+    with patch.object(collector, "_dispatch") as mock_dispatch:
         await collector.process_message(message)
 
-    mock_update.assert_called_once()
-    call_args = mock_update.call_args[0][0]
-    assert isinstance(call_args, PoolOccupancyData)
-    assert call_args.uid == "SSD-1"
-    assert call_args.currentfill == 50
+    pools = [call.args[0] for call in mock_dispatch.call_args_list]
+    assert all(isinstance(pool, PoolOccupancyData) for pool in pools)
+    assert [(p.uid, p.maxspace, p.currentfill) for p in pools] == expected
 
 
-@pytest.mark.asyncio
-async def test_process_message_multiple_pools(
+def test_dispatch_updates_metrics(
     collector: OccupancyCollector, mock_metrics: PoolMetrics
 ) -> None:
-    """Test processing a message with multiple pools."""
-    message = json.dumps(
-        [
-            {
-                "uid": "SSD-1",
-                "name": "Pool One",
-                "freespace": 50,
-                "maxspace": 100,
-                "currentfill": "50",
-            },
-            {
-                "uid": "SSD-2",
-                "name": "Pool Two",
-                "freespace": 25,
-                "maxspace": 75,
-                "currentfill": "50",
-            },
-        ]
-    )
+    """Test that each dispatched pool updates the occupancy metrics."""
+    pools = [
+        PoolOccupancyData(
+            uid="SSD-1", name="Pool One", freespace=50, maxspace=100, currentfill=50
+        ),
+        PoolOccupancyData(
+            uid="SSD-2", name="Pool Two", freespace=25, maxspace=75, currentfill=50
+        ),
+    ]
 
     with patch.object(mock_metrics, "update_occupancy_metrics") as mock_update:
-        await collector.process_message(message)
+        for pool in pools:
+            collector._dispatch(pool)
 
-    assert mock_update.call_count == 2
+    assert [call.args[0] for call in mock_update.call_args_list] == pools
 
 
-@pytest.mark.asyncio
-async def test_process_message_zero_capacity(
+def test_dispatch_skips_unchanged_pools(
     collector: OccupancyCollector, mock_metrics: PoolMetrics
 ) -> None:
-    """Test processing a message with zero capacity (edge case)."""
-    message = json.dumps(
-        [
-            {
-                "uid": "SSD-1",
-                "name": "Pool One",
-                "freespace": 0,
-                "maxspace": 0,  # Edge case: zero capacity
-                "currentfill": "0",
-            }
-        ]
+    """Test that repeated identical data is only published once per change."""
+    first = PoolOccupancyData(
+        uid="SSD-1", name="Pool One", freespace=50, maxspace=100, currentfill=50
     )
+    changed = replace(first, freespace=49, currentfill=51)
 
     with patch.object(mock_metrics, "update_occupancy_metrics") as mock_update:
-        await collector.process_message(message)
+        for pool in (first, replace(first), changed, changed, first):
+            collector._dispatch(pool)
 
-    mock_update.assert_called_once()
-    call_args = mock_update.call_args[0][0]
-    assert call_args.maxspace == 0
-    assert call_args.currentfill == 0
+    assert [call.args[0] for call in mock_update.call_args_list] == [
+        first,
+        changed,
+        first,
+    ]
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "message",
-    [
-        "not valid json {[",  # Invalid JSON
-        json.dumps({"uid": "SSD-1", "name": "Pool One"}),  # Wrong format (not a list)
-        json.dumps([{"uid": "SSD-1", "name": "Pool One"}]),  # Missing required fields
-    ],
-)
+@pytest.mark.parametrize("message", _INVALID_MESSAGES)
 async def test_process_message_invalid_data(
     collector: OccupancyCollector, message: str
 ) -> None:
@@ -173,14 +180,28 @@ async def test_process_message_invalid_data(
 
 
 @pytest.mark.asyncio
-async def test_connect_websocket_success(collector: OccupancyCollector) -> None:
+@pytest.mark.parametrize("message", _INVALID_MESSAGES)
+async def test_process_message_invalid_data_logged_without_traceback(
+    collector: OccupancyCollector, message: str, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that malformed messages do not pay for a traceback."""
+    with caplog.at_level(logging.WARNING, logger="pool_exporter.occupancy_collector"):
+        await collector.process_message(message)
+
+    assert caplog.records
+    assert all(record.exc_info is None for record in caplog.records)
+
+
+@pytest.mark.asyncio
+async def test_connect_websocket_success(
+    collector: OccupancyCollector, mock_websocket: AsyncMock
+) -> None:
     """Test successful WebSocket connection."""
-    mock_websocket = AsyncMock()
-    collector.running = True
+    collector._stop.clear()
 
     # Mock connect as an async function that returns the mock websocket
     async def mock_connect(*args: object, **kwargs: object) -> AsyncMock:
-        collector.running = False  # Stop to prevent infinite loop
+        collector.stop()  # Stop to prevent infinite loop
         return mock_websocket
 
     with patch(
@@ -194,29 +215,43 @@ async def test_connect_websocket_success(collector: OccupancyCollector) -> None:
 @pytest.mark.asyncio
 async def test_connect_websocket_failure_retry(collector: OccupancyCollector) -> None:
     """Test WebSocket connection failure with retry logic."""
-    collector.running = True
+    collector._stop.clear()
 
     # Simulate connection failure, then stop
     async def side_effect(*args: object, **kwargs: object) -> None:
-        collector.running = False  # Stop after first attempt
+        collector.stop()  # Stop after first attempt
         raise WebSocketException("Connection failed")
 
-    with (
-        patch(
-            "pool_exporter.occupancy_collector.websockets.connect",
-            side_effect=side_effect,
-        ),
-        patch("asyncio.sleep", new_callable=AsyncMock),
+    with patch(
+        "pool_exporter.occupancy_collector.websockets.connect",
+        side_effect=side_effect,
     ):
         result = await collector.connect_websocket()
 
     assert result is None
 
 
+@pytest.mark.asyncio
+async def test_connect_websocket_reuses_ssl_context(
+    collector: OccupancyCollector, mock_websocket: AsyncMock
+) -> None:
+    """Test that every connection attempt uses the same SSL context."""
+    connect = AsyncMock(return_value=mock_websocket)
+
+    with patch("pool_exporter.occupancy_collector.websockets.connect", connect):
+        for _ in range(2):
+            collector._stop.clear()
+            await collector.connect_websocket()
+
+    contexts = [call.kwargs["ssl"] for call in connect.call_args_list]
+    assert contexts == [collector._ssl_context] * 2
+    assert isinstance(collector._ssl_context, ssl.SSLContext)
+
+
 @pytest.mark.asyncio
 async def test_connect_websocket_not_running(collector: OccupancyCollector) -> None:
     """Test that connect_websocket returns None when not running."""
-    collector.running = False
+    collector.stop()
 
     result = await collector.connect_websocket()
 
@@ -225,39 +260,18 @@ async def test_connect_websocket_not_running(collector: OccupancyCollector) -> N
 
 @pytest.mark.asyncio
 async def test_run_success(
-    collector: OccupancyCollector, mock_metrics: PoolMetrics
+    collector: OccupancyCollector, mock_metrics: PoolMetrics, mock_websocket: AsyncMock
 ) -> None:
     """Test successful run loop."""
-
-    # Create a task that will run the collector and cancel it after a short delay
-    async def run_with_timeout() -> None:
-        # Stop the collector after receiving one message
-        await asyncio.sleep(0.01)
-        collector.stop()
-
-    mock_websocket = AsyncMock()
-    mock_websocket.send = AsyncMock()
-    mock_websocket.close = AsyncMock()
-
     message_count = 0
 
     async def mock_iter(self: object) -> object:
         nonlocal message_count
         # Yield one message
         message_count += 1
-        yield json.dumps(
-            [
-                {
-                    "uid": "SSD-1",
-                    "name": "Pool One",
-                    "freespace": 50,
-                    "maxspace": 100,
-                    "currentfill": "50",
-                }
-            ]
-        )
-        # Then wait to allow the timeout task to stop the collector
-        await asyncio.sleep(0.02)
+        yield _MSG_ONE_POOL
+        # Then stop the collector after receiving one message
+        collector.stop()
 
     mock_websocket.__aiter__ = lambda self: mock_iter(self)
 
@@ -268,8 +282,7 @@ async def test_run_success(
         patch.object(collector, "connect_websocket", side_effect=mock_connect),
         patch.object(mock_metrics, "update_occupancy_metrics"),
     ):
-        # Run both tasks concurrently
-        await asyncio.gather(collector.run(), run_with_timeout())
+        await collector.run()
 
     assert message_count == 1
     mock_websocket.send.assert_called_once_with("all")
@@ -277,16 +290,35 @@ async def test_run_success(
 
 
 @pytest.mark.asyncio
-async def test_run_connection_closed(collector: OccupancyCollector) -> None:
-    """Test run loop handling ConnectionClosed exception."""
+async def test_stop_interrupts_retry_wait(collector: OccupancyCollector) -> None:
+    """Test that stop() ends the wait between connection attempts right away."""
+    collector.retry_interval = 60
+    connect = AsyncMock(side_effect=WebSocketException("Connection failed"))
+
+    with patch("pool_exporter.occupancy_collector.websockets.connect", connect):
+        task = asyncio.create_task(collector.run())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        assert connect.await_count == 1
 
-    async def run_with_timeout() -> None:
-        await asyncio.sleep(0.01)
         collector.stop()
+        await asyncio.wait_for(task, 0.5)
+
+    assert connect.await_count == 1
 
-    mock_websocket = AsyncMock()
-    mock_websocket.send = AsyncMock()
-    mock_websocket.close = AsyncMock()
+
+@pytest.mark.asyncio
+async def test_run_connection_closed(
+    collector: OccupancyCollector, mock_websocket: AsyncMock
+) -> None:
+    """Test run loop handling ConnectionClosed exception."""
+
+    collector.retry_interval = 60
+
+    async def stop_while_waiting() -> None:
+        # Runs once the collector waits to reconnect, which stop() must end
+        await asyncio.sleep(0)
+        collector.stop()
 
     # Simulate ConnectionClosed exception
     async def mock_iter(self: object) -> AsyncGenerator[None]:
@@ -299,22 +331,26 @@ async def test_run_connection_closed(collector: OccupancyCollector) -> None:
         return mock_websocket
 
     with patch.object(collector, "connect_websocket", side_effect=mock_connect):
-        await asyncio.gather(collector.run(), run_with_timeout())
+        # A reconnect wait that stop() fails to interrupt would time out here
+        await asyncio.wait_for(
+            asyncio.gather(collector.run(), stop_while_waiting()), 0.5
+        )
 
     assert not collector.running
 
 
 @pytest.mark.asyncio
-async def test_run_websocket_exception(collector: OccupancyCollector) -> None:
+async def test_run_websocket_exception(
+    collector: OccupancyCollector, mock_websocket: AsyncMock
+) -> None:
     """Test run loop handling generic WebSocket exception."""
 
-    async def run_with_timeout() -> None:
-        await asyncio.sleep(0.01)
-        collector.stop()
+    collector.retry_interval = 60
 
-    mock_websocket = AsyncMock()
-    mock_websocket.send = AsyncMock()
-    mock_websocket.close = AsyncMock()
+    async def stop_while_waiting() -> None:
+        # Runs once the collector waits to reconnect, which stop() must end
+        await asyncio.sleep(0)
+        collector.stop()
 
     # Simulate exception during message iteration
     async def mock_iter(self: object) -> AsyncGenerator[None]:
@@ -327,7 +363,10 @@ async def test_run_websocket_exception(collector: OccupancyCollector) -> None:
         return mock_websocket
 
     with patch.object(collector, "connect_websocket", side_effect=mock_connect):
-        await asyncio.gather(collector.run(), run_with_timeout())
+        # A reconnect wait that stop() fails to interrupt would time out here
+        await asyncio.wait_for(
+            asyncio.gather(collector.run(), stop_while_waiting()), 0.5
+        )
 
     assert not collector.running
 
@@ -354,20 +393,16 @@ async def test_run_no_connection(collector: OccupancyCollector) -> None:
 
 def test_stop(collector: OccupancyCollector) -> None:
     """Test stop method."""
-    collector.running = True
+    collector._stop.clear()
     collector.stop()
     assert not collector.running
 
 
 @pytest.mark.asyncio
 async def test_run_reconnect_after_connection_closed(
-    collector: OccupancyCollector,
+    collector: OccupancyCollector, mock_websocket: AsyncMock
 ) -> None:
     """Test that run attempts to reconnect after connection is closed."""
-    mock_websocket = AsyncMock()
-    mock_websocket.send = AsyncMock()
-    mock_websocket.close = AsyncMock()
-
     connection_attempts = 0
 
     async def mock_connect_impl() -> AsyncMock | None:
@@ -385,10 +420,7 @@ async def test_run_reconnect_after_connection_closed(
 
     mock_websocket.__aiter__ = mock_iter
 
-    with (
-        patch.object(collector, "connect_websocket", side_effect=mock_connect_impl),
-        patch("asyncio.sleep", new_callable=AsyncMock),
-    ):
+    with patch.object(collector, "connect_websocket", side_effect=mock_connect_impl):
         await collector.run()
 
     # Should attempt to connect twice (initial + reconnect)
@@ -1,69 +1,22 @@
-from unittest.mock import AsyncMock, patch
+import asyncio
+from dataclasses import replace
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import aiohttp
 import pytest
-from prometheus_client import CollectorRegistry, Gauge
+from conftest import build_fake_metrics, build_metrics
+from prometheus_client import CollectorRegistry
 
 from pool_exporter.api_types import TemperatureData
-from pool_exporter.config import (
-    AppConfig,
-    LoggingConfig,
-    MetricsConfig,
-    OccupancyConfig,
-    PoolConfig,
-    TemperatureConfig,
-)
+from pool_exporter.config import AppConfig, PoolConfig
 from pool_exporter.metrics import PoolMetrics
-from pool_exporter.temperature_collector import TemperatureCollector
-
-
-@pytest.fixture
-def mock_config() -> AppConfig:
-    """Create a mock configuration for testing."""
-    return AppConfig(
-        occupancy=OccupancyConfig(
-            url="wss://test.com",
-            retry_interval_seconds=10,
-            timeout_seconds=5,
-            ping_interval_seconds=20.0,
-            ping_timeout_seconds=10.0,
-        ),
-        temperature=TemperatureConfig(
-            url="https://test.com/temperature.xml",
-            poll_interval_seconds=1,  # Short interval for testing
-            timeout_seconds=10,
-        ),
-        metrics=MetricsConfig(port=8000, endpoint="/metrics", namespace="zurich_pools"),
-        pools=[
-            PoolConfig(uid="SSD-1", name="Pool One", alt_uid="alt-1"),
-            PoolConfig(uid="SSD-2", name="Pool Two"),
-            PoolConfig(uid="SSD-3", name="Pool Three", hardcoded_temperatur=25),
-        ],
-        logging=LoggingConfig(level="INFO", format="%(message)s"),
-    )
-
-
-@pytest.fixture
-def custom_registry() -> CollectorRegistry:
-    """Create a custom Prometheus registry for each test to avoid conflicts."""
-    return CollectorRegistry()
+from pool_exporter.temperature_collector import _NOT_MODIFIED, TemperatureCollector
 
 
 @pytest.fixture
-def mock_metrics(
-    mock_config: AppConfig, custom_registry: CollectorRegistry
-) -> PoolMetrics:
-    """Create a mock PoolMetrics instance with custom registry."""
-    with (
-        patch("pool_exporter.metrics.start_http_server"),
-        patch("pool_exporter.metrics.Gauge") as mock_gauge,
-    ):
-
-        def create_gauge(name: str, doc: str, labelnames: list[str]) -> Gauge:
-            return Gauge(name, doc, labelnames, registry=custom_registry)
-
-        mock_gauge.side_effect = create_gauge
-        return PoolMetrics(mock_config)
+def mock_metrics(mock_config: AppConfig) -> PoolMetrics:
+    """Create a PoolMetrics instance with mock gauges."""
+    return build_fake_metrics(mock_config)
 
 
 @pytest.fixture
@@ -71,18 +24,69 @@ def collector(
     mock_config: AppConfig, mock_metrics: PoolMetrics
 ) -> TemperatureCollector:
     """Create a TemperatureCollector instance."""
-    return TemperatureCollector(mock_config, mock_metrics)
+    return TemperatureCollector(mock_config, mock_metrics, _mock_session())
+
+
+def _mock_session(
+    status: int = 200,
+    body: bytes = b"",
+    exception: Exception | None = None,
+    headers: dict[str, str] | None = None,
+) -> MagicMock:
+    """Create a mock aiohttp session whose get() yields a canned response."""
+    mock_response = AsyncMock()
+    mock_response.status = status
+    mock_response.headers = headers or {}
+    mock_response.read = AsyncMock(return_value=body)
+
+    mock_get = MagicMock()
+    mock_get.__aenter__ = AsyncMock(return_value=mock_response, side_effect=exception)
+    mock_get.__aexit__ = AsyncMock(return_value=None)
+
+    mock_session = MagicMock()
+    mock_session.get = MagicMock(return_value=mock_get)
+    return mock_session
 
 
 @pytest.mark.asyncio
 async def test_fetch_temperature_data_success(collector: TemperatureCollector) -> None:
     """Test successful temperature data fetching."""
-    with patch.object(
-        collector, "fetch_temperature_data", return_value="<xml>test data</xml>"
-    ):
-        result = await collector.fetch_temperature_data()
+    collector.session = _mock_session(body=b"<xml>test data</xml>")
+
+    result = await collector.fetch_temperature_data()
 
-    assert result == "<xml>test data</xml>"
+    assert result == b"<xml>test data</xml>"
+
+
+@pytest.mark.asyncio
+async def test_fetch_temperature_data_uses_client_timeout(
+    collector: TemperatureCollector,
+) -> None:
+    """Test that requests carry separate connect, read and total timeouts."""
+    await collector.fetch_temperature_data()
+
+    timeout = collector.session.get.call_args.kwargs["timeout"]  # type: ignore[attr-defined]
+    assert timeout == aiohttp.ClientTimeout(total=10, connect=10 / 3, sock_read=10)
+
+
+def test_client_timeout_from_config(
+    mock_config: AppConfig, mock_metrics: PoolMetrics
+) -> None:
+    """Test that configured connect and read timeouts override the defaults."""
+    config = replace(
+        mock_config,
+        temperature=replace(
+            mock_config.temperature,
+            connect_timeout_seconds=2.0,
+            sock_read_timeout_seconds=4.0,
+        ),
+    )
+
+    collector = TemperatureCollector(config, mock_metrics, _mock_session())
+
+    assert collector._client_timeout == aiohttp.ClientTimeout(
+        total=10, connect=2.0, sock_read=4.0
+    )
 
 
 @pytest.mark.asyncio
@@ -91,18 +95,9 @@ async def test_fetch_temperature_data_http_errors(
     collector: TemperatureCollector, status_code: int
 ) -> None:
     """Test fetching temperature data with various HTTP error codes."""
-    mock_response = AsyncMock()
-    mock_response.status = status_code
-
-    mock_session = AsyncMock()
-    mock_session.get = AsyncMock(return_value=mock_response)
-    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
-    mock_session.__aexit__ = AsyncMock()
-    mock_response.__aenter__ = AsyncMock(return_value=mock_response)
-    mock_response.__aexit__ = AsyncMock()
+    collector.session = _mock_session(status=status_code)
 
-    with patch("aiohttp.ClientSession", return_value=mock_session):
-        result = await collector.fetch_temperature_data()
+    result = await collector.fetch_temperature_data()
 
     assert result is None
 
@@ -119,17 +114,89 @@ async def test_fetch_temperature_data_exceptions(
     collector: TemperatureCollector, exception: Exception
 ) -> None:
     """Test fetching temperature data with various exceptions."""
-    mock_session = AsyncMock()
-    mock_session.get = AsyncMock(side_effect=exception)
-    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
-    mock_session.__aexit__ = AsyncMock()
+    collector.session = _mock_session(exception=exception)
 
-    with patch("aiohttp.ClientSession", return_value=mock_session):
-        result = await collector.fetch_temperature_data()
+    result = await collector.fetch_temperature_data()
 
     assert result is None
 
 
+@pytest.mark.asyncio
+async def test_fetch_temperature_data_uses_shared_session(
+    collector: TemperatureCollector,
+) -> None:
+    """Test that fetches go through the injected session and leave it open."""
+    mock_session = _mock_session(body=b"<baths></baths>")
+    mock_session.close = AsyncMock()
+    collector.session = mock_session
+
+    assert await collector.fetch_temperature_data() == b"<baths></baths>"
+    collector._cache = None
+    assert await collector.fetch_temperature_data() == b"<baths></baths>"
+
+    assert mock_session.get.call_count == 2
+    mock_session.close.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_fetch_temperature_data_not_modified(
+    collector: TemperatureCollector,
+) -> None:
+    """Test that validators are sent back and a 304 is reported as unchanged."""
+    collector.session = _mock_session(
+        body=b"<baths></baths>",
+        headers={"ETag": '"abc"', "Last-Modified": "Wed, 01 Jan 2025 12:00:00 GMT"},
+    )
+    assert await collector.fetch_temperature_data() == b"<baths></baths>"
+    assert collector.session.get.call_args.kwargs["headers"] == {}
+
+    collector.session = _mock_session(status=304)
+    collector._cache = None
+    assert await collector.fetch_temperature_data() is _NOT_MODIFIED
+    assert collector.session.get.call_args.kwargs["headers"] == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Wed, 01 Jan 2025 12:00:00 GMT",
+    }
+
+
+@pytest.mark.asyncio
+async def test_fetch_temperature_data_empty_body(
+    collector: TemperatureCollector,
+) -> None:
+    """Test that an empty 200 response is a failure, not an unchanged document."""
+    collector.session = _mock_session(body=b"", headers={"ETag": '"abc"'})
+
+    assert await collector.fetch_temperature_data() is None
+    assert collector._etag is None
+    assert collector._cache is None
+
+
+@pytest.mark.asyncio
+async def test_collect_empty_body_is_failure(collector: TemperatureCollector) -> None:
+    """Test that collect reports an empty 200 response as a failed poll."""
+    collector.session = _mock_session(body=b"")
+
+    with patch.object(collector, "parse_temperature_data") as mock_parse:
+        assert not await collector.collect()
+
+    mock_parse.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fetch_temperature_data_cached(collector: TemperatureCollector) -> None:
+    """Test that a fetch within half a poll interval is served from the cache."""
+    mock_session = _mock_session(body=b"<baths></baths>")
+    collector.session = mock_session
+
+    with patch("time.monotonic", side_effect=[100.0, 100.4, 100.5]):
+        assert await collector.fetch_temperature_data() == b"<baths></baths>"
+        assert await collector.fetch_temperature_data() == b"<baths></baths>"
+        assert mock_session.get.call_count == 1
+
+        assert await collector.fetch_temperature_data() == b"<baths></baths>"
+        assert mock_session.get.call_count == 2
+
+
 def test_parse_temperature_data_valid(collector: TemperatureCollector) -> None:
     """Test parsing valid XML temperature data."""
     xml_data = """<?xml version="1.0"?>
@@ -178,6 +245,33 @@ def test_parse_temperature_data_multiple_pools(collector: TemperatureCollector)
     assert result[1].pool_id == "ssd-2"
 
 
+def test_parse_temperature_data_nested_baths(collector: TemperatureCollector) -> None:
+    """Test that bath entries below wrapper elements are found."""
+    xml_data = b"""<?xml version="1.0" encoding="UTF-8"?>
+<bathinfos>
+    <baths>
+        <bath>
+            <poiid>SSD-1</poiid>
+            <title>Pool One</title>
+            <temperatureWater>25.5</temperatureWater>
+        </bath>
+    </baths>
+    <baths>
+        <bath>
+            <poiid>SSD-2</poiid>
+            <title>Pool Two</title>
+            <temperatureWater>26.0</temperatureWater>
+        </bath>
+    </baths>
+</bathinfos>
+"""
+
+    result = collector.parse_temperature_data(xml_data)
+
+    assert [pool.pool_id for pool in result] == ["ssd-1", "ssd-2"]
+    assert [pool.temperature for pool in result] == [25.5, 26.0]
+
+
 def test_parse_temperature_data_zero_temperature(
     collector: TemperatureCollector,
 ) -> None:
@@ -240,24 +334,42 @@ def test_parse_temperature_data_missing_optional_fields(
     assert result[0].last_updated is None
 
 
+@pytest.mark.parametrize(
+    "temperature,expected",
+    [
+        ("not_a_number", None),
+        ("25,5", None),
+        ("nan", None),
+        ("inf", None),
+        (" 21 ", 21.0),
+        ("-0.5", -0.5),
+        ("+1", 1.0),
+        (".5", 0.5),
+        ("1e1", 10.0),
+    ],
+)
 def test_parse_temperature_data_invalid_temperature(
-    collector: TemperatureCollector,
+    collector: TemperatureCollector, temperature: str, expected: float | None
 ) -> None:
-    """Test parsing XML with invalid temperature value."""
-    xml_data = """<?xml version="1.0"?>
+    """Test parsing XML with invalid or unusual temperature values."""
+    xml_data = f"""<?xml version="1.0"?>
 <baths>
     <bath>
         <poiid>SSD-1</poiid>
         <title>Pool One</title>
-        <temperatureWater>not_a_number</temperatureWater>
+        <temperatureWater>{temperature}</temperatureWater>
     </bath>
 </baths>
 """
 
     result = collector.parse_temperature_data(xml_data)
 
-    # Should skip pools with invalid temperature
-    assert len(result) == 0
+    if expected is None:
+        # Should skip pools with invalid temperature
+        assert len(result) == 0
+    else:
+        assert len(result) == 1
+        assert result[0].temperature == expected
 
 
 def test_parse_temperature_data_malformed_xml(collector: TemperatureCollector) -> None:
@@ -301,6 +413,30 @@ def test_update_metrics(
     assert mock_update.call_args[0][0] == pool_data[0]
 
 
+def test_update_metrics_skips_unchanged_pools(
+    collector: TemperatureCollector, mock_metrics: PoolMetrics
+) -> None:
+    """Test that pools are only republished when their reading changes."""
+    first = [
+        TemperatureData(pool_id="SSD-1", title="Pool One", temperature=25.5),
+        TemperatureData(pool_id="SSD-2", title="Pool Two", temperature=21.0),
+    ]
+    second = [
+        TemperatureData(pool_id="SSD-1", title="Pool One", temperature=25.5),
+        TemperatureData(pool_id="SSD-2", title="Pool Two", temperature=22.0),
+    ]
+
+    with patch.object(mock_metrics, "update_temperature_metrics") as mock_update:
+        collector.update_metrics(first)
+        collector.update_metrics(second)
+
+    assert [call.args[0] for call in mock_update.call_args_list] == [
+        first[0],
+        first[1],
+        second[1],
+    ]
+
+
 @pytest.mark.asyncio
 async def test_collect_success(
     collector: TemperatureCollector, mock_metrics: PoolMetrics
@@ -322,7 +458,7 @@ async def test_collect_success(
         ) as mock_fetch,
         patch.object(mock_metrics, "update_temperature_metrics") as mock_update,
     ):
-        await collector.collect()
+        assert await collector.collect()
 
     mock_fetch.assert_called_once()
     mock_update.assert_called_once()
@@ -334,11 +470,23 @@ async def test_collect_fetch_failure(collector: TemperatureCollector) -> None:
     with patch.object(
         collector, "fetch_temperature_data", return_value=None
     ) as mock_fetch:
-        await collector.collect()
+        assert not await collector.collect()
 
     mock_fetch.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_collect_not_modified(collector: TemperatureCollector) -> None:
+    """Test that an unchanged payload counts as success and is not parsed."""
+    with (
+        patch.object(collector, "fetch_temperature_data", return_value=_NOT_MODIFIED),
+        patch.object(collector, "parse_temperature_data") as mock_parse,
+    ):
+        assert await collector.collect()
+
+    mock_parse.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_collect_parse_failure(
     collector: TemperatureCollector, mock_metrics: PoolMetrics
@@ -363,20 +511,43 @@ async def test_run(collector: TemperatureCollector) -> None:
     """Test the run loop."""
     collect_count = 0
 
-    async def mock_collect() -> None:
+    async def mock_collect() -> bool:
         nonlocal collect_count
         collect_count += 1
         if collect_count >= 2:
             collector.stop()
+        return True
 
     with (
         patch.object(collector, "collect", side_effect=mock_collect),
-        patch("asyncio.sleep", new_callable=AsyncMock),
+        patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep,
     ):
         await collector.run()
 
     assert collect_count == 2
     assert not collector.running
+    mock_sleep.assert_awaited_once()
+    delay = mock_sleep.await_args_list[0].args[0]
+    assert delay == pytest.approx(collector.poll_interval, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_run_subtracts_collect_time(collector: TemperatureCollector) -> None:
+    """Test that the time spent collecting is deducted from the poll delay."""
+    loop = asyncio.get_running_loop()
+    times = iter([100.0, 100.25])
+
+    async def mock_sleep(delay: float) -> None:
+        collector.stop()
+
+    with (
+        patch.object(collector, "collect", return_value=True),
+        patch.object(loop, "time", side_effect=lambda: next(times)),
+        patch("asyncio.sleep", side_effect=mock_sleep) as mock_sleep_patch,
+    ):
+        await collector.run()
+
+    mock_sleep_patch.assert_awaited_once_with(collector.poll_interval - 0.25)
 
 
 @pytest.mark.asyncio
@@ -384,13 +555,13 @@ async def test_run_with_exception(collector: TemperatureCollector) -> None:
     """Test run loop handling exceptions during collection."""
     collect_count = 0
 
-    async def mock_collect() -> None:
+    async def mock_collect() -> bool:
         nonlocal collect_count
         collect_count += 1
         if collect_count == 1:
             raise Exception("Collection error")
-        else:
-            collector.stop()
+        collector.stop()
+        return True
 
     with (
         patch.object(collector, "collect", side_effect=mock_collect),
@@ -401,6 +572,93 @@ async def test_run_with_exception(collector: TemperatureCollector) -> None:
     # Should continue after exception
     assert collect_count == 2
     assert not collector.running
+    assert collector._failures == 0
+
+
+@pytest.mark.asyncio
+async def test_run_backs_off_after_failures(collector: TemperatureCollector) -> None:
+    """Test that failed polls increase the delay and a success resets it."""
+    results = [False, False, True]
+    delays: list[float] = []
+
+    async def mock_collect() -> bool:
+        return results.pop(0)
+
+    async def mock_sleep(delay: float) -> None:
+        delays.append(delay)
+        if not results:
+            collector.stop()
+
+    with (
+        patch.object(collector, "collect", side_effect=mock_collect),
+        patch("asyncio.sleep", side_effect=mock_sleep),
+        patch("random.uniform", return_value=0.5),
+    ):
+        await collector.run()
+
+    # poll_interval is 1 second: 2**1 + jitter, 2**2 + jitter, then back to 1
+    assert delays == pytest.approx([2.5, 4.5, 1], abs=0.1)
+
+
+@pytest.mark.parametrize(
+    "failures,expected",
+    [
+        (0, 1),
+        (1, 2),
+        (5, 32),
+        (12, 3600),
+        (16, 3600),
+    ],
+)
+def test_next_delay_is_capped(
+    collector: TemperatureCollector, failures: int, expected: float
+) -> None:
+    """Test the backoff delay for a number of consecutive failures."""
+    collector._failures = failures
+
+    with patch("random.uniform", return_value=0):
+        assert collector._next_delay() == expected
+
+
+@pytest.mark.parametrize("failures", [1, 5, 16])
+def test_next_delay_never_exceeds_long_poll_interval(
+    collector: TemperatureCollector, failures: int
+) -> None:
+    """Test that an hourly poller does not back off past its own interval."""
+    collector.poll_interval = 3600
+    collector._failures = failures
+
+    with patch("random.uniform", return_value=0):
+        assert collector._next_delay() == 3600
+
+
+@pytest.mark.asyncio
+async def test_run_backoff_stays_capped_during_long_outage(
+    collector: TemperatureCollector,
+) -> None:
+    """Test that the delay stays at the cap after many consecutive failures."""
+    remaining = 1100
+    delays: list[float] = []
+
+    async def mock_sleep(delay: float) -> None:
+        nonlocal remaining
+        delays.append(delay)
+        remaining -= 1
+        if not remaining:
+            collector.stop()
+
+    with (
+        patch.object(collector, "collect", return_value=False),
+        patch("asyncio.sleep", side_effect=mock_sleep),
+        patch("random.uniform", return_value=0),
+    ):
+        await collector.run()
+
+    assert len(delays) == 1100
+    # poll_interval is 1 second, so the cap is one hour
+    assert delays[-1] == pytest.approx(3600, abs=0.1)
+    assert max(delays) <= 3600 + 0.1
+    assert collector._failures <= 16
 
 
 def test_stop(collector: TemperatureCollector) -> None:
@@ -411,22 +669,13 @@ def test_stop(collector: TemperatureCollector) -> None:
 
 
 def test_publish_hardcoded_temperature(
-    mock_config: AppConfig, custom_registry: CollectorRegistry
+    mock_config: AppConfig,
 ) -> None:
     """Test that hardcoded temperatures are published on initialization."""
-    with (
-        patch("pool_exporter.metrics.start_http_server"),
-        patch("pool_exporter.metrics.Gauge") as mock_gauge,
-    ):
-
-        def create_gauge(name: str, doc: str, labelnames: list[str]) -> Gauge:
-            return Gauge(name, doc, labelnames, registry=custom_registry)
-
-        mock_gauge.side_effect = create_gauge
-        mock_metrics = PoolMetrics(mock_config)
+    mock_metrics = build_fake_metrics(mock_config)
 
     with patch.object(mock_metrics, "update_temperature_metrics") as mock_update:
-        TemperatureCollector(mock_config, mock_metrics)
+        TemperatureCollector(mock_config, mock_metrics, _mock_session())
 
     # Should be called once for the pool with hardcoded temperature (SSD-3)
     mock_update.assert_called_once()
@@ -435,6 +684,87 @@ def test_publish_hardcoded_temperature(
     assert call_args.temperature == 25
 
 
+@pytest.mark.asyncio
+async def test_run_republishes_hardcoded_temperature(
+    collector: TemperatureCollector, mock_metrics: PoolMetrics
+) -> None:
+    """Test that hardcoded temperatures are published again when run starts."""
+
+    async def mock_collect() -> None:
+        collector.stop()
+
+    with (
+        patch.object(collector, "collect", side_effect=mock_collect),
+        patch.object(mock_metrics, "update_temperature_metrics") as mock_update,
+    ):
+        await collector.run()
+
+    mock_update.assert_called_once()
+    assert mock_update.call_args[0][0].pool_id == "SSD-3"
+
+
+@pytest.mark.asyncio
+async def test_run_restart_refetches_polled_temperature(
+    mock_config: AppConfig,
+) -> None:
+    """Test that a restart does not leave hard-coded values over polled ones.
+
+    The upstream answers 304 to conditional requests, so the restart must not
+    send the validators of the document fetched before it.
+    """
+    config = replace(
+        mock_config,
+        pools=[
+            PoolConfig(
+                uid="SSD-6", name="Pool Six", alt_uid="hb006", hardcoded_temperatur=29
+            )
+        ],
+    )
+    registry = CollectorRegistry()
+    metrics = build_metrics(config, registry)
+    xml_data = b"""<?xml version="1.0"?>
+<baths>
+    <bath>
+        <poiid>hb006</poiid>
+        <title>Pool Six</title>
+        <temperatureWater>24.5</temperatureWater>
+    </bath>
+</baths>
+"""
+
+    def get(url: str, headers: dict[str, str], timeout: object) -> object:
+        if "If-None-Match" in headers:
+            return _mock_session(status=304).get()
+        return _mock_session(body=xml_data, headers={"ETag": '"abc"'}).get()
+
+    session = MagicMock()
+    session.get = MagicMock(side_effect=get)
+    collector = TemperatureCollector(config, metrics, session)
+
+    def temperature() -> float | None:
+        return registry.get_sample_value(
+            "zurich_pools_water_temperature",
+            {"pool_uid": "SSD-6", "pool_name": "Pool Six"},
+        )
+
+    assert await collector.collect()
+    assert temperature() == 24.5
+    # Age the cached response, as if the restart happened an hour later
+    assert collector._cache is not None
+    fetched_at, body = collector._cache
+    collector._cache = (fetched_at - 3600, body)
+
+    # Restart: run() publishes the hard-coded value again, then polls once
+    async def mock_sleep(delay: float) -> None:
+        collector.stop()
+
+    with patch("asyncio.sleep", side_effect=mock_sleep):
+        await collector.run()
+
+    assert session.get.call_args.kwargs["headers"] == {}
+    assert temperature() == 24.5
+
+
 def test_parse_temperature_data_empty_string_fields(
     collector: TemperatureCollector,
 ) -> None: